@@ -1,15 +1,44 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from contextlib import contextmanager
-from app.config import settings
+from sqlalchemy import Index, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncConnection, AsyncSession
+from sqlalchemy.orm import DeclarativeBase
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Tuple
+from loguru import logger
+from app.config import get_settings
 
-# Fix Railway's DATABASE_URL format (postgresql:// -> postgresql+psycopg://)
+settings = get_settings()
+
+# Fix Railway's DATABASE_URL format (postgresql:// -> postgresql+asyncpg://)
 database_url = settings.DATABASE_URL
 if database_url.startswith("postgresql://"):
-    database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
+    database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+elif database_url.startswith("postgresql+psycopg://"):
+    database_url = database_url.replace("postgresql+psycopg://", "postgresql+asyncpg://", 1)
+
+# Server-side prepared statements: hot lookups are parsed/planned once per connection.
+# Transaction-mode PgBouncer can hand a statement to another backend, so turn them off there.
+connect_args = {}
+if database_url.startswith("postgresql+asyncpg://"):
+    statement_cache_size = 0 if settings.DB_PGBOUNCER else settings.DB_STATEMENT_CACHE_SIZE
+    connect_args = {
+        "statement_cache_size": statement_cache_size,  # asyncpg's own cache
+        "prepared_statement_cache_size": statement_cache_size,  # SQLAlchemy dialect cache
+    }
 
-engine = create_engine(database_url, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# The async engine uses AsyncAdaptedQueuePool, sized the same way as before
+engine = create_async_engine(
+    database_url,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    # Bounded LRU of compiled select() statements; repeated endpoints skip the SQL compiler
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    connect_args=connect_args,
+)
+# expire_on_commit=False so ORM attributes stay readable after the scope commits
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
@@ -17,15 +46,109 @@ class Base(DeclarativeBase):
 
 
 # Dependency for FastAPI
-@contextmanager
-def session_scope():
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
     session = SessionLocal()
     try:
         yield session
-        session.commit()
+        await session.commit()
     except Exception:
-        session.rollback()
+        await session.rollback()
         raise
     finally:
-        session.close()
+        await session.close()
+
+
+async def init_db() -> None:
+    """Create required Postgres extensions and all tables."""
+    from app import models  # noqa: F401 - register tables on Base.metadata
+    
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # pgvector backs Enrollment.embedding_vector; pg_trgm backs text search
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            await _migrate_created_at(conn, ("users", "enrollments", "chunks"))
+            await _migrate_embedding_column(conn, models.EMBEDDING_DIM)
+            await _migrate_segment_user_id(conn, models.SEGMENTS_USER_TIMELINE_INDEX)
+            # The trigram index needs pg_trgm, created above
+            await _create_missing_indexes(
+                conn, (*models.COMPOSITE_INDEXES, models.SEGMENTS_TEXT_TRGM_INDEX)
+            )
+
+
+async def _migrate_created_at(conn: AsyncConnection, tables: Tuple[str, ...]) -> None:
+    """
+    Bring created_at on older tables in line with the models: timestamptz with a now() default.
+    
+    Those columns used to be naive UTC timestamps filled in by Python, and create_all
+    never alters existing tables, so without this new rows would get NULL. Naive
+    values are read as UTC when converting. Setting the default is idempotent.
+    """
+    for table in tables:
+        data_type = await conn.scalar(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() "
+            "AND table_name = :table AND column_name = 'created_at'"
+        ), {"table": table})
+        if data_type == "timestamp without time zone":
+            logger.info(f"Migrating {table}.created_at to timestamptz")
+            await conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN created_at TYPE timestamptz "
+                "USING created_at AT TIME ZONE 'UTC'"
+            ))
+        await conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT now()"))
+
+
+async def _migrate_embedding_column(conn: AsyncConnection, dim: int) -> None:
+    """
+    Convert a pre-pgvector enrollments.embedding_vector column to vector(dim) in place.
+    
+    create_all never alters existing columns, so older databases still store the
+    embedding as JSON-encoded text. A JSON array such as "[0.1, -0.2]" is also a
+    valid vector literal, so the rows convert with a plain cast. No-op once the
+    column is already a vector.
+    """
+    data_type = await conn.scalar(text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() "
+        "AND table_name = 'enrollments' AND column_name = 'embedding_vector'"
+    ))
+    if data_type in ("text", "character varying", "json", "jsonb"):
+        logger.info(f"Migrating enrollments.embedding_vector from {data_type} to vector({dim})")
+        await conn.execute(text(
+            f"ALTER TABLE enrollments ALTER COLUMN embedding_vector TYPE vector({dim}) "
+            "USING NULLIF(embedding_vector::text, 'null')::vector"
+        ))
+
+
+async def _migrate_segment_user_id(conn: AsyncConnection, timeline_index: Index) -> None:
+    """
+    Add and backfill segments.user_id on databases created before the column existed.
+    
+    create_all skips existing tables along with their indexes, so the per-user
+    timeline index is created here too (a no-op when it already exists).
+    """
+    has_column = await conn.scalar(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = current_schema() "
+        "AND table_name = 'segments' AND column_name = 'user_id'"
+    ))
+    if not has_column:
+        logger.info("Adding segments.user_id and backfilling it from chunks")
+        await conn.execute(text(
+            "ALTER TABLE segments ADD COLUMN user_id INTEGER REFERENCES users (id)"
+        ))
+        await conn.execute(text(
+            "UPDATE segments SET user_id = chunks.user_id "
+            "FROM chunks WHERE chunks.id = segments.chunk_id"
+        ))
+    await conn.run_sync(timeline_index.create, checkfirst=True)
+
 
+async def _create_missing_indexes(conn: AsyncConnection, indexes: Tuple[Index, ...]) -> None:
+    """Create indexes that create_all skipped because their table already existed."""
+    for index in indexes:
+        await conn.run_sync(index.create, checkfirst=True)
@@ -3,12 +3,22 @@ FastAPI dependencies for authentication and authorization.
 """
 
 from fastapi import Header, HTTPException, Depends
-from typing import Optional, Annotated
+from typing import Optional, Annotated, Tuple
 from loguru import logger
-from app.services.firebase_auth import verify_id_token
+from fastapi.concurrency import run_in_threadpool
+from app.services.firebase_auth import cached_token_claims, verify_id_token
 from app.db import session_scope
 from app import models
-from sqlalchemy.orm import Session
+from app.utils.cache import TTLCache
+from sqlalchemy import select, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+# Firebase uid -> users.id. Users are never deleted, so hits can skip the DB.
+_user_id_cache = TTLCache(maxsize=10_000, ttl=3600)
+
+# Built once so every execution reuses the same compiled/prepared statement
+USER_ID_BY_UID = select(models.User.id).where(models.User.uid == bindparam("uid"))
 
 
 async def get_current_user_uid(
@@ -41,8 +51,12 @@ async def get_current_user_uid(
     
     token = authorization[7:]  # Remove "Bearer " prefix
     
-    # Verify token
-    decoded_token = verify_id_token(token)
+    # Verify token (cached per token in firebase_auth until shortly before `exp`).
+    # A miss runs the signature check, and possibly a certificate fetch, which
+    # block; do that in the threadpool so the event loop keeps serving requests
+    decoded_token = cached_token_claims(token)
+    if decoded_token is None:
+        decoded_token = await run_in_threadpool(verify_id_token, token)
     
     if not decoded_token:
         raise HTTPException(
@@ -58,11 +72,16 @@ async def get_current_user_uid(
             detail="Token missing user ID"
         )
     
-    logger.debug(f"Authenticated user: {uid}")
+    logger.debug("Authenticated user: {}", uid)
     return uid
 
 
-def get_or_create_user(uid: str, email: Optional[str] = None, display_name: Optional[str] = None) -> models.User:
+async def get_or_create_user(
+    uid: str,
+    email: Optional[str] = None,
+    display_name: Optional[str] = None,
+    db: Optional[AsyncSession] = None
+) -> int:
     """
     Get or create a user from Firebase UID.
     
@@ -70,22 +89,57 @@ def get_or_create_user(uid: str, email: Optional[str] = None, display_name: Opti
         uid: Firebase user ID
         email: User email (optional)
         display_name: User display name (optional)
+        db: Caller's open session to run in (optional). Without one, a short
+            session of its own is opened and committed.
     
     Returns:
-        User model instance
+        User ID (primary key)
     """
-    with session_scope() as db:
-        user = db.query(models.User).filter_by(uid=uid).first()
-        
-        if not user:
-            user = models.User(
-                uid=uid,
-                email=email or f"{uid}@placeholder.com",
-                display_name=display_name or "User"
-            )
-            db.add(user)
-            db.flush()
-            logger.info(f"Created new user: {uid}")
-        
-        return user
+    user_id = _user_id_cache.get(uid)
+    if user_id is not None:
+        return user_id
+    
+    if db is not None:
+        user_id, created = await _select_or_insert_user(db, uid, email, display_name)
+        # A row we just inserted only exists once the caller commits; cache it next time
+        if not created:
+            _user_id_cache.set(uid, user_id)
+        return user_id
+    
+    async with session_scope() as own_db:
+        user_id, _ = await _select_or_insert_user(own_db, uid, email, display_name)
+    
+    # Only cache once the session has committed
+    _user_id_cache.set(uid, user_id)
+    return user_id
+
+
+async def _select_or_insert_user(
+    db: AsyncSession,
+    uid: str,
+    email: Optional[str],
+    display_name: Optional[str]
+) -> Tuple[int, bool]:
+    """Return (user id, whether this call inserted the row) for a Firebase UID."""
+    user_id = await db.scalar(USER_ID_BY_UID, {"uid": uid})
+    if user_id is not None:
+        return user_id, False
+    
+    # Idempotent insert: concurrent first requests for the same uid can't collide
+    user_id = await db.scalar(
+        pg_insert(models.User)
+        .values(
+            uid=uid,
+            email=email or f"{uid}@placeholder.com",
+            display_name=display_name or "User"
+        )
+        .on_conflict_do_nothing(index_elements=["uid"])
+        .returning(models.User.id)
+    )
+    if user_id is None:
+        # Another request inserted this uid between our SELECT and INSERT
+        return await db.scalar(USER_ID_BY_UID, {"uid": uid}), False
+    
+    logger.info(f"Created new user: {uid}")
+    return user_id, True
 
@@ -1,22 +1,72 @@
+import sys
+import anyio.to_thread
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from app.config import get_settings
 from app.routes import enrollment, chunks, utterances, webhooks, audio
-from app.db import Base, engine
-from app import models
+from app.db import engine, init_db
+from app.services import assemblyai_client, geocode_store, geocoding
+from app.services.firebase_auth import warm_firebase
+from app.services.speaker_verification import warm_inference_pipeline
+from app.utils.responses import ORJSONResponse
 from loguru import logger
 
-app = FastAPI(title="Selective Speaker Backend", version="0.1.0")
+# Replace loguru's default DEBUG-level stderr sink so filtered messages cost nothing
+logger.remove()
+logger.add(sys.stderr, level=get_settings().LOG_LEVEL)
+
+app = FastAPI(
+    title="Selective Speaker Backend",
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+)
 
 
 @app.on_event("startup")
-def startup_event():
-    """Initialize database tables on startup."""
+async def startup_event():
+    """Initialize database tables, warm the embedding model and Firebase auth, and load cached addresses."""
+    settings = get_settings()
+    # Threadpool shared by run_in_threadpool, sync endpoints, FileResponse and StreamingResponse iteration
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    
     try:
         logger.info("📊 Creating database tables...")
-        Base.metadata.create_all(engine)
+        await init_db()
         logger.info("✅ Database tables created successfully!")
     except Exception as e:
         logger.error(f"❌ Failed to create database tables: {e}")
         raise
+    
+    if settings.PRELOAD_EMBEDDING_MODEL:
+        # Without a usable model the API still serves reads; webhooks retry the load lazily
+        try:
+            await run_in_threadpool(warm_inference_pipeline)
+        except Exception as e:
+            logger.warning(f"⚠️ Speaker embedding model not preloaded: {e}")
+    
+    if settings.PRELOAD_FIREBASE_AUTH:
+        # Best effort: token verification initializes lazily if this fails
+        try:
+            await run_in_threadpool(warm_firebase)
+        except Exception as e:
+            logger.warning(f"⚠️ Firebase auth not preloaded: {e}")
+    
+    loaded = await run_in_threadpool(geocoding.preload_cache)
+    if loaded:
+        logger.info(f"Loaded {loaded} cached addresses from the geocode disk cache")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled outbound HTTP connections and the geocode disk cache."""
+    await assemblyai_client.close_client()
+    await geocoding.close_client()
+    # Only close the Cloudinary download client if something imported cloud_storage;
+    # importing it here would configure the Cloudinary SDK just to shut down
+    cloud_storage = sys.modules.get("app.services.cloud_storage")
+    if cloud_storage is not None:
+        cloud_storage.close_client()
+    geocode_store.close()
 
 
 app.include_router(enrollment.router)
@@ -33,7 +83,7 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "db_pool": engine.pool.status()}
 
 
 # Uvicorn: uvicorn app.main:app --reload
@@ -1,9 +1,14 @@
-from sqlalchemy import Integer, String, Boolean, ForeignKey, Float, DateTime, Text
+from sqlalchemy import Integer, String, Boolean, ForeignKey, Float, DateTime, Text, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
 from datetime import datetime
 from typing import Optional, List
 from app.db import Base
 
+# pyannote/embedding produces 512-dimensional speaker embeddings
+EMBEDDING_DIM = 512
+
 
 class User(Base):
     __tablename__ = "users"
@@ -11,7 +16,7 @@ class User(Base):
     uid: Mapped[str] = mapped_column(String(128), unique=True, index=True)  # Firebase UID
     display_name: Mapped[Optional[str]] = mapped_column(String(128))
     email: Mapped[Optional[str]] = mapped_column(String(256))
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     enrollments: Mapped[List["Enrollment"]] = relationship(back_populates="user", cascade="all, delete")
 
@@ -19,13 +24,13 @@ class User(Base):
 class Enrollment(Base):
     __tablename__ = "enrollments"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     audio_url: Mapped[str] = mapped_column(String(512))
     duration_ms: Mapped[int] = mapped_column(Integer)
     phrase_text: Mapped[Optional[str]] = mapped_column(Text)
     edit_distance: Mapped[Optional[int]] = mapped_column(Integer)
-    embedding_vector: Mapped[Optional[str]] = mapped_column(Text)  # JSON-encoded numpy array
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    embedding_vector: Mapped[Optional[List[float]]] = mapped_column(Vector(EMBEDDING_DIM))  # pgvector column
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     user: Mapped["User"] = relationship(back_populates="enrollments")
 
@@ -33,7 +38,7 @@ class Enrollment(Base):
 class Chunk(Base):
     __tablename__ = "chunks"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     audio_url: Mapped[str] = mapped_column(String(512))
     device_id: Mapped[Optional[str]] = mapped_column(String(128))
     start_ts: Mapped[Optional[datetime]] = mapped_column(DateTime)
@@ -41,13 +46,14 @@ class Chunk(Base):
     gps_lat: Mapped[Optional[float]] = mapped_column(Float)
     gps_lon: Mapped[Optional[float]] = mapped_column(Float)
     transcript_id: Mapped[Optional[str]] = mapped_column(String(128), index=True)  # AssemblyAI transcript ID
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
 class Segment(Base):
     __tablename__ = "segments"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    chunk_id: Mapped[int] = mapped_column(ForeignKey("chunks.id"), index=True)
+    chunk_id: Mapped[int] = mapped_column(ForeignKey("chunks.id"))
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"))  # copy of the chunk's owner, for per-user listing
     speaker_label: Mapped[str] = mapped_column(String(64))
     start_ms: Mapped[int] = mapped_column(Integer)  # relative to original chunk (not concatenated file)
     end_ms: Mapped[int] = mapped_column(Integer)
@@ -63,3 +69,28 @@ class Location(Base):
     address: Mapped[Optional[str]] = mapped_column(Text)
     source: Mapped[Optional[str]] = mapped_column(String(64))
 
+
+# Composite indexes for the hot filter/sort patterns:
+# latest enrollment / newest chunks per user, and kept segments of a chunk ordered by time.
+# init_db also creates them on databases whose tables predate them
+COMPOSITE_INDEXES = (
+    Index("ix_enrollments_user_created", Enrollment.user_id, Enrollment.created_at.desc()),
+    Index("ix_chunks_user_created", Chunk.user_id, Chunk.created_at.desc()),
+    Index("ix_segments_chunk_kept_start", Segment.chunk_id, Segment.kept, Segment.start_ms),
+)
+# Timeline/search pages: a user's newest kept segments (partial index, kept rows only).
+# Keyed on Segment.user_id, which matches their filter and sort; init_db also creates
+# it on databases where segments predates the column
+SEGMENTS_USER_TIMELINE_INDEX = Index(
+    "ix_segments_kept_user_id_desc",
+    Segment.user_id,
+    Segment.id.desc(),
+    postgresql_where=Segment.kept,
+)
+# Substring search (ILIKE '%q%') on segment text via pg_trgm; Postgres-only operator class
+SEGMENTS_TEXT_TRGM_INDEX = Index(
+    "ix_segments_text_trgm",
+    Segment.text,
+    postgresql_using="gin",
+    postgresql_ops={"text": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
@@ -2,14 +2,16 @@
 Audio playback routes for streaming utterance audio segments.
 """
 
-from fastapi import APIRouter, HTTPException, Response, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select
 from typing import Annotated
 from loguru import logger
 from app.db import session_scope
 from app import models
 from app.storage import local_path
-from app.utils.audio_extraction import extract_audio_segment
+from app.utils.audio_extraction import stream_audio_segment
 from app.dependencies import get_current_user_uid
 
 router = APIRouter(prefix="/audio", tags=["audio"])
@@ -31,38 +33,40 @@ async def get_utterance_audio(
     Returns:
         Audio segment as WAV file
     """
-    with session_scope() as db:  # type: Session
-        # Get user
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
-            raise HTTPException(status_code=403, detail="User not found")
-        
-        # Get utterance (stored as Segment) and chunk
-        utterance = db.query(models.Segment).filter_by(id=utterance_id).first()
-        
-        if not utterance:
-            raise HTTPException(status_code=404, detail=f"Utterance {utterance_id} not found")
-        
-        chunk = db.query(models.Chunk).filter_by(id=utterance.chunk_id).first()
-        
-        if not chunk:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Chunk {utterance.chunk_id} not found for utterance {utterance_id}"
-            )
-        
-        # Authorization check: verify user owns this chunk
-        if chunk.user_id != user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="You don't have permission to access this audio"
+    async with session_scope() as db:
+        # One round-trip: utterance (stored as Segment) + its chunk + the chunk owner's uid
+        row = (await db.execute(
+            select(
+                models.Segment.chunk_id,
+                models.Segment.start_ms,
+                models.Segment.end_ms,
+                models.Chunk.audio_url,
+                models.User.uid.label("owner_uid"),
             )
-        
-        # Get data before session closes
-        chunk_audio_url = chunk.audio_url
-        start_ms = utterance.start_ms
-        end_ms = utterance.end_ms
-        utterance_text = utterance.text
+            .outerjoin(models.Chunk, models.Chunk.id == models.Segment.chunk_id)
+            .outerjoin(models.User, models.User.id == models.Chunk.user_id)
+            .where(models.Segment.id == utterance_id)
+        )).one_or_none()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail=f"Utterance {utterance_id} not found")
+    
+    if row.audio_url is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Chunk {row.chunk_id} not found for utterance {utterance_id}"
+        )
+    
+    # Authorization check: verify user owns this chunk
+    if row.owner_uid != user_uid:
+        raise HTTPException(
+            status_code=403,
+            detail="You don't have permission to access this audio"
+        )
+    
+    chunk_audio_url = row.audio_url
+    start_ms = row.start_ms
+    end_ms = row.end_ms
     
     # Get audio file path
     audio_path = local_path(chunk_audio_url)
@@ -75,26 +79,29 @@ async def get_utterance_audio(
         )
     
     try:
-        # Extract audio segment
-        audio_bytes = extract_audio_segment(
+        # Stream the extracted segment instead of building it in memory.
+        # Opening/seeking the WAV is blocking I/O, so keep it off the event loop;
+        # StreamingResponse then iterates the sync generator in the threadpool.
+        content_length, chunks = await run_in_threadpool(
+            stream_audio_segment,
             input_path=audio_path,
             start_ms=start_ms,
             end_ms=end_ms
         )
         
-        logger.info(
-            f"Serving audio for utterance {utterance_id}: "
-            f"{len(audio_bytes)} bytes, {end_ms - start_ms}ms"
+        # Per-request detail at DEBUG with deferred formatting: nothing is built when filtered out
+        logger.debug(
+            "Serving audio for utterance {}: {} bytes, {}ms",
+            utterance_id, content_length, end_ms - start_ms
         )
         
         # Return as WAV file
-        return Response(
-            content=audio_bytes,
+        return StreamingResponse(
+            chunks,
             media_type="audio/wav",
             headers={
                 "Content-Disposition": f'inline; filename="utterance_{utterance_id}.wav"',
-                "Content-Length": str(len(audio_bytes)),
-                "Accept-Ranges": "bytes"
+                "Content-Length": str(content_length),
             }
         )
         
@@ -114,7 +121,8 @@ async def get_chunk_audio(
     """
     Get full audio for a chunk.
     
-    Returns the entire chunk audio file.
+    Returns the entire chunk audio file. Honors HTTP Range requests
+    (206 Partial Content) so players can seek without re-downloading.
     
     Args:
         chunk_id: ID of the chunk
@@ -122,25 +130,25 @@ async def get_chunk_audio(
     Returns:
         Full chunk audio as WAV file
     """
-    with session_scope() as db:  # type: Session
-        # Get user
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
-            raise HTTPException(status_code=403, detail="User not found")
-        
-        chunk = db.query(models.Chunk).filter_by(id=chunk_id).first()
-        
-        if not chunk:
-            raise HTTPException(status_code=404, detail=f"Chunk {chunk_id} not found")
-        
-        # Authorization check
-        if chunk.user_id != user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="You don't have permission to access this audio"
-            )
-        
-        chunk_audio_url = chunk.audio_url
+    async with session_scope() as db:
+        # One round-trip: chunk + owner's uid
+        row = (await db.execute(
+            select(models.Chunk.audio_url, models.User.uid.label("owner_uid"))
+            .outerjoin(models.User, models.User.id == models.Chunk.user_id)
+            .where(models.Chunk.id == chunk_id)
+        )).one_or_none()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail=f"Chunk {chunk_id} not found")
+    
+    # Authorization check
+    if row.owner_uid != user_uid:
+        raise HTTPException(
+            status_code=403,
+            detail="You don't have permission to access this audio"
+        )
+    
+    chunk_audio_url = row.audio_url
     
     # Get audio file path
     audio_path = local_path(chunk_audio_url)
@@ -152,28 +160,13 @@ async def get_chunk_audio(
             detail=f"Audio file not found: {chunk_audio_url}"
         )
     
-    try:
-        # Read full file
-        with open(audio_path, 'rb') as f:
-            audio_bytes = f.read()
-        
-        logger.info(f"Serving chunk {chunk_id} audio: {len(audio_bytes)} bytes")
-        
-        # Return as WAV file
-        return Response(
-            content=audio_bytes,
-            media_type="audio/wav",
-            headers={
-                "Content-Disposition": f'inline; filename="chunk_{chunk_id}.wav"',
-                "Content-Length": str(len(audio_bytes)),
-                "Accept-Ranges": "bytes"
-            }
-        )
-        
-    except Exception as e:
-        logger.error(f"Error reading chunk audio {chunk_id}: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to read audio: {e}"
-        )
-
+    logger.debug("Serving chunk {} audio: {}", chunk_id, audio_path)
+    
+    # FileResponse streams from disk (sendfile where available) and handles
+    # Range / multipart byteranges itself, answering 206 or 416 as appropriate
+    return FileResponse(
+        audio_path,
+        media_type="audio/wav",
+        filename=f"chunk_{chunk_id}.wav",
+        content_disposition_type="inline",
+    )
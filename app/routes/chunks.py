@@ -1,12 +1,13 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Form, Depends
-from sqlalchemy.orm import Session
-from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert, update
+from sqlalchemy.engine import Row
+from datetime import datetime, timezone
 from loguru import logger
 from typing import Optional, Annotated
 from app.db import session_scope
 from app import models, schemas
 from app.storage import local_path, save_uploaded_file
-from app.utils.audio import concatenate_audio_files, WAVInfo
 from app.services.assemblyai_client import upload_audio_file, submit_transcription
 from app.dependencies import get_current_user_uid, get_or_create_user
 
@@ -58,11 +59,14 @@ async def process_chunk_transcription(
             f"transcript_id={transcript_id}, status={result.get('status')}"
         )
         
-        # Store transcript_id in database for webhook lookup
-        with session_scope() as db:
-            chunk = db.query(models.Chunk).filter_by(id=chunk_id).first()
-            if chunk:
-                chunk.transcript_id = transcript_id
+        # Store transcript_id in database for webhook lookup (single UPDATE, no row load)
+        async with session_scope() as db:
+            result = await db.execute(
+                update(models.Chunk)
+                .where(models.Chunk.id == chunk_id)
+                .values(transcript_id=transcript_id)
+            )
+            if result.rowcount:
                 logger.info(f"Stored transcript_id {transcript_id} for chunk {chunk_id}")
         
     except Exception as e:
@@ -86,8 +90,8 @@ async def upload_chunk(
     try:
         # Save uploaded file
         filename = f"chunk_{file.filename}"
-        file_path = save_uploaded_file(file, filename)
-        logger.info(f"Saved uploaded chunk: {filename}")
+        file_path = await run_in_threadpool(save_uploaded_file, file, filename)
+        logger.info("Saved uploaded chunk: {}", filename)
         
         # Convert form data
         lat = float(gps_lat) if gps_lat else None
@@ -131,49 +135,44 @@ async def submit_chunk(
     Returns:
         Chunk ID and queued status
     """
-    with session_scope() as db:
-        # Get current user from auth token
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
-            # Create user if doesn't exist
-            get_or_create_user(user_uid)
-            user = db.query(models.User).filter_by(uid=user_uid).first()
+    async with session_scope() as db:
+        # Get (or create) current user from auth token
+        user_id = await get_or_create_user(user_uid, db=db)
         
         # Verify user has enrollment
-        enrollment = db.query(models.Enrollment).filter_by(user_id=user.id).order_by(
-            models.Enrollment.created_at.desc()
-        ).first()
+        enrollment = (await db.execute(
+            select(models.Enrollment.id, models.Enrollment.duration_ms)
+            .where(models.Enrollment.user_id == user_id)
+            .order_by(models.Enrollment.created_at.desc())
+            .limit(1)
+        )).first()
         if not enrollment:
             raise HTTPException(
                 status_code=400,
                 detail="No enrollment found. Please complete enrollment first."
             )
         
-        # Create chunk record
-        chunk = models.Chunk(
-            user_id=user.id,
-            audio_url=payload.audio_url,
-            device_id=payload.device_id,
-            start_ts=payload.start_ts,
-            end_ts=payload.end_ts,
-            gps_lat=payload.gps_lat,
-            gps_lon=payload.gps_lon,
+        # Create chunk record; INSERT ... RETURNING hands back the id in the same round-trip.
+        # start_ts/end_ts are naive UTC columns, which asyncpg won't fill from aware datetimes
+        values = payload.model_dump()
+        values["start_ts"] = _naive_utc(values["start_ts"])
+        values["end_ts"] = _naive_utc(values["end_ts"])
+        chunk_id = await db.scalar(
+            insert(models.Chunk)
+            .values(user_id=user_id, **values)
+            .returning(models.Chunk.id)
         )
-        db.add(chunk)
-        db.flush()
-        
-        chunk_id = chunk.id
         enrollment_ms = enrollment.duration_ms
         
         # Queue transcription processing in background
         background_tasks.add_task(
             process_chunk_transcription,
-            user_id=user.id,
+            user_id=user_id,
             chunk_id=chunk_id,
             chunk_audio_url=payload.audio_url
         )
         
-        logger.info(f"Chunk {chunk_id} submitted for transcription")
+        logger.info("Chunk {} submitted for transcription", chunk_id)
         
         return {
             "status": "queued",
@@ -184,8 +183,15 @@ async def submit_chunk(
         }
 
 
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """Convert an aware datetime to naive UTC; naive values and None pass through."""
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 @router.get("/{chunk_id}")
-def get_chunk(chunk_id: int):
+async def get_chunk(chunk_id: int):
     """
     Get chunk details and associated segments.
     
@@ -195,31 +201,58 @@ def get_chunk(chunk_id: int):
     Returns:
         Chunk metadata and segments
     """
-    with session_scope() as db:
-        chunk = db.query(models.Chunk).filter_by(id=chunk_id).first()
-        if not chunk:
-            raise HTTPException(status_code=404, detail="Chunk not found")
-        
-        segments = db.query(models.Segment).filter_by(chunk_id=chunk_id, kept=True).all()
-        location = db.query(models.Location).filter_by(chunk_id=chunk_id).first()
-        
-        return {
-            "chunk_id": chunk.id,
-            "device_id": chunk.device_id,
-            "start_ts": chunk.start_ts.isoformat() if chunk.start_ts else None,
-            "end_ts": chunk.end_ts.isoformat() if chunk.end_ts else None,
-            "gps_lat": chunk.gps_lat,
-            "gps_lon": chunk.gps_lon,
-            "address": location.address if location else None,
-            "segments": [
-                {
-                    "id": seg.id,
-                    "start_ms": seg.start_ms,
-                    "end_ms": seg.end_ms,
-                    "text": seg.text,
-                    "confidence": seg.confidence
-                }
-                for seg in segments
-            ]
-        }
+    async with session_scope() as db:
+        # One round-trip: chunk + its address + kept segments (one row per segment)
+        rows = (await db.execute(
+            select(
+                models.Chunk.id.label("chunk_id"),
+                models.Chunk.device_id,
+                models.Chunk.start_ts,
+                models.Chunk.end_ts,
+                models.Chunk.gps_lat,
+                models.Chunk.gps_lon,
+                models.Location.address,
+                models.Segment.id.label("segment_id"),
+                models.Segment.start_ms,
+                models.Segment.end_ms,
+                models.Segment.text,
+                models.Segment.confidence,
+            )
+            .outerjoin(models.Location, models.Location.chunk_id == models.Chunk.id)
+            .outerjoin(
+                models.Segment,
+                (models.Segment.chunk_id == models.Chunk.id) & (models.Segment.kept == True),
+            )
+            .where(models.Chunk.id == chunk_id)
+            .order_by(models.Segment.start_ms)
+        )).all()
+    
+    if not rows:
+        raise HTTPException(status_code=404, detail="Chunk not found")
+    
+    chunk = rows[0]
+    return {
+        "chunk_id": chunk.chunk_id,
+        "device_id": chunk.device_id,
+        "start_ts": chunk.start_ts,  # datetimes are encoded by orjson
+        "end_ts": chunk.end_ts,
+        "gps_lat": chunk.gps_lat,
+        "gps_lon": chunk.gps_lon,
+        "address": chunk.address,
+        "segments": [
+            _segment_out(row)
+            for row in rows
+            if row.segment_id is not None  # chunk without kept segments -> one NULL row
+        ]
+    }
+
 
+def _segment_out(row: Row) -> schemas.ChunkSegmentOut:
+    """Build the ChunkSegmentOut dict for one get_chunk row (explicit fields, no attribute probing)."""
+    return {
+        "id": row.segment_id,
+        "start_ms": row.start_ms,
+        "end_ms": row.end_ms,
+        "text": row.text,
+        "confidence": row.confidence,
+    }
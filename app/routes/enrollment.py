@@ -1,13 +1,14 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from loguru import logger
-import json
 from typing import Optional, Annotated
 from app.db import session_scope
 from app import models, schemas
 from app.storage import local_path, save_uploaded_file
 from app.services.speaker_verification import extract_embedding
-from app.dependencies import get_current_user_uid, get_or_create_user
+from app.services.enrollment_cache import invalidate_enrollment_embedding
+from app.dependencies import get_current_user_uid, get_or_create_user, USER_ID_BY_UID
 
 router = APIRouter(prefix="/enrollment", tags=["enrollment"])
 
@@ -28,45 +29,46 @@ async def upload_enrollment(
     try:
         # Save uploaded file
         filename = f"enrollment_{file.filename}"
-        file_path = save_uploaded_file(file, filename)
+        file_path = await run_in_threadpool(save_uploaded_file, file, filename)
         logger.info(f"Saved enrollment file: {filename}")
         
         # Convert duration to int
         duration = int(duration_ms)
         
-        # Get or create user from Firebase UID
-        user = get_or_create_user(user_uid)
+        # Extract speaker embedding (CPU-bound inference, keep it off the event loop)
+        # before opening the session so no pooled connection waits on the model
+        logger.info(f"Extracting embedding for {filename}")
+        embedding = await run_in_threadpool(extract_embedding, file_path)
+        logger.info(f"Embedding extracted: {embedding.shape} dimensions")
         
         # Create enrollment record
-        with session_scope() as db:
-            user = db.query(models.User).filter_by(uid=user_uid).first()
-            
-            # Extract speaker embedding
-            logger.info(f"Extracting embedding for user {user.id}")
-            embedding = extract_embedding(file_path)
-            embedding_json = json.dumps(embedding.tolist())
-            logger.info(f"Embedding extracted: {embedding.shape} dimensions")
+        async with session_scope() as db:
+            # Get or create user from Firebase UID in the same transaction
+            user_id = await get_or_create_user(user_uid, db=db)
             
             # Create enrollment
             enrollment = models.Enrollment(
-                user_id=user.id,
+                user_id=user_id,
                 audio_url=filename,
                 duration_ms=duration,
                 phrase_text=phrase_text,
                 edit_distance=None,
-                embedding_vector=embedding_json,
+                embedding_vector=embedding,
             )
             db.add(enrollment)
-            db.flush()
-            
-            logger.info(f"Enrollment complete: enrollment_id={enrollment.id}")
-            
-            return {
-                "status": "ok",
-                "enrollment_id": enrollment.id,
-                "user_id": user.id,
-                "embedding_dimensions": len(embedding)
-            }
+            await db.flush()
+            enrollment_id = enrollment.id
+        
+        # After commit, so no webhook can re-cache the previous embedding
+        invalidate_enrollment_embedding(user_id)
+        logger.info(f"Enrollment complete: enrollment_id={enrollment_id}")
+        
+        return {
+            "status": "ok",
+            "enrollment_id": enrollment_id,
+            "user_id": user_id,
+            "embedding_dimensions": len(embedding)
+        }
             
     except Exception as e:
         logger.error(f"Error uploading enrollment: {e}", exc_info=True)
@@ -74,7 +76,7 @@ async def upload_enrollment(
 
 
 @router.post("/complete")
-def complete_enrollment(
+async def complete_enrollment(
     payload: schemas.EnrollmentCreate,
     user_uid: Annotated[str, Depends(get_current_user_uid)] = None
 ):
@@ -92,90 +94,98 @@ def complete_enrollment(
     Returns:
         Enrollment ID and status
     """
-    # Get or create user from Firebase UID
-    user = get_or_create_user(user_uid)
+    # Extract speaker embedding from enrollment audio (before any DB connection is held)
+    logger.info(f"Processing enrollment for {user_uid}")
+    audio_path = local_path(payload.audio_url)
     
-    with session_scope() as db:  # type: Session
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        
-        # Extract speaker embedding from enrollment audio
-        logger.info(f"Processing enrollment for user {user.id}")
-        audio_path = local_path(payload.audio_url)
-        
-        if not audio_path.exists():
-            raise HTTPException(
-                status_code=400,
-                detail=f"Enrollment audio file not found: {payload.audio_url}"
-            )
-        
-        try:
-            logger.info(f"Extracting embedding from {audio_path}")
-            embedding = extract_embedding(audio_path)
-            embedding_json = json.dumps(embedding.tolist())
-            logger.info(f"Embedding extracted successfully: {embedding.shape} dimensions")
-        except Exception as e:
-            logger.error(f"Error extracting embedding: {e}", exc_info=True)
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to extract speaker embedding: {e}"
-            )
+    if not audio_path.exists():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Enrollment audio file not found: {payload.audio_url}"
+        )
+    
+    try:
+        logger.info(f"Extracting embedding from {audio_path}")
+        embedding = await run_in_threadpool(extract_embedding, audio_path)
+        logger.info(f"Embedding extracted successfully: {embedding.shape} dimensions")
+    except Exception as e:
+        logger.error(f"Error extracting embedding: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to extract speaker embedding: {e}"
+        )
+    
+    async with session_scope() as db:
+        # Get or create user from Firebase UID in the same transaction
+        user_id = await get_or_create_user(user_uid, db=db)
         
         # Create enrollment record
         enrollment = models.Enrollment(
-            user_id=user.id,
+            user_id=user_id,
             audio_url=payload.audio_url,
             duration_ms=payload.duration_ms,
             phrase_text=payload.phrase_text,
             edit_distance=payload.edit_distance,
-            embedding_vector=embedding_json,
+            embedding_vector=embedding,
         )
         db.add(enrollment)
-        db.flush()
-        
-        logger.info(f"Enrollment complete: enrollment_id={enrollment.id}")
-        
-        return {
-            "status": "ok",
-            "enrollment_id": enrollment.id,
-            "user_id": user.id,
-            "embedding_dimensions": len(embedding)
-        }
+        await db.flush()
+        enrollment_id = enrollment.id
+    
+    # After commit, so no webhook can re-cache the previous embedding
+    invalidate_enrollment_embedding(user_id)
+    logger.info(f"Enrollment complete: enrollment_id={enrollment_id}")
+    
+    return {
+        "status": "ok",
+        "enrollment_id": enrollment_id,
+        "user_id": user_id,
+        "embedding_dimensions": len(embedding)
+    }
 
 
 @router.post("/reset")
-def reset_enrollment(user_uid: Annotated[str, Depends(get_current_user_uid)] = None):
+async def reset_enrollment(user_uid: Annotated[str, Depends(get_current_user_uid)] = None):
     """
     Reset enrollment for current user.
     
     Marks old enrollment as inactive and allows user to record new sample.
     Previous utterances remain intact but future chunks will use new voiceprint.
     """
-    with session_scope() as db:
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
+    async with session_scope() as db:
+        user_id = await db.scalar(USER_ID_BY_UID, {"uid": user_uid})
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
-        
-        # In production, you might mark old enrollments as inactive
-        # rather than deleting them
-        return {"status": "ok", "message": "Ready for new enrollment"}
+    
+    invalidate_enrollment_embedding(user_id)
+    
+    # In production, you might mark old enrollments as inactive
+    # rather than deleting them
+    return {"status": "ok", "message": "Ready for new enrollment"}
 
 
 @router.get("/status")
-def enrollment_status(user_uid: Annotated[str, Depends(get_current_user_uid)] = None):
+async def enrollment_status(user_uid: Annotated[str, Depends(get_current_user_uid)] = None):
     """
     Check if current user has completed enrollment.
     
     Returns:
         Enrollment status and details
     """
-    with session_scope() as db:
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
-            return {"enrolled": False}
-        
-        enrollment = db.query(models.Enrollment).filter_by(user_id=user.id).order_by(
-            models.Enrollment.created_at.desc()
-        ).first()
+    async with session_scope() as db:
+        # One round-trip: resolve the user and fetch only the latest enrollment's scalars
+        # (never the embedding), served by ix_users_uid + ix_enrollments_user_created
+        enrollment = (await db.execute(
+            select(
+                models.Enrollment.id,
+                models.Enrollment.duration_ms,
+                models.Enrollment.created_at,
+            )
+            .join(models.User, models.User.id == models.Enrollment.user_id)
+            .where(models.User.uid == user_uid)
+            .order_by(models.Enrollment.created_at.desc())
+            .limit(1)
+        )).first()
         
         if not enrollment:
             return {"enrolled": False}
@@ -184,6 +194,6 @@ def enrollment_status(user_uid: Annotated[str, Depends(get_current_user_uid)] =
             "enrolled": True,
             "enrollment_id": enrollment.id,
             "duration_ms": enrollment.duration_ms,
-            "created_at": enrollment.created_at.isoformat()
+            "created_at": enrollment.created_at
         }
 
@@ -1,16 +1,50 @@
 from fastapi import APIRouter, Query, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import Optional, List, Annotated
+from sqlalchemy import select, desc
+from sqlalchemy.engine import Row
+from typing import Optional, Annotated
 from app.db import session_scope
 from app import models, schemas
-from app.dependencies import get_current_user_uid
+from app.dependencies import get_current_user_uid, USER_ID_BY_UID
 
 router = APIRouter(prefix="/utterances", tags=["utterances"])
 
+# Only the columns an utterance bubble needs, with kept segments joined to their
+# chunk (metadata) and location (address); callers add the user filter
+UTTERANCE_ROWS = (
+    select(
+        models.Segment.id,
+        models.Segment.chunk_id,
+        models.Segment.start_ms,
+        models.Segment.end_ms,
+        models.Segment.text,
+        models.Chunk.device_id,
+        models.Chunk.start_ts,
+        models.Chunk.end_ts,
+        models.Chunk.created_at,
+        models.Location.address,
+    )
+    .join(models.Chunk, models.Chunk.id == models.Segment.chunk_id)
+    .outerjoin(models.Location, models.Location.chunk_id == models.Chunk.id)
+    .where(models.Segment.kept == True)
+)
+
+
+def _utterance_bubble(row: Row) -> schemas.UtteranceBubble:
+    """Build the UtteranceBubble dict for one UTTERANCE_ROWS row."""
+    return {
+        "id": row.id,  # Include utterance ID for audio playback
+        "chunk_id": row.chunk_id,
+        "start_ms": row.start_ms,
+        "end_ms": row.end_ms,
+        "text": row.text,
+        "device_id": row.device_id,
+        "timestamp": row.end_ts or row.start_ts or row.created_at,
+        "address": row.address,
+    }
+
 
 @router.get("")
-def list_utterances(
+async def list_utterances(
     limit: int = Query(50, ge=1, le=200),
     before_id: Optional[int] = None,
     user_uid: Annotated[str, Depends(get_current_user_uid)] = None
@@ -28,51 +62,33 @@ def list_utterances(
     Returns:
         List of utterance bubbles with text, timestamps, and locations
     """
-    with session_scope() as db:
+    async with session_scope() as db:
         # Get user
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
+        user_id = await db.scalar(USER_ID_BY_UID, {"uid": user_uid})
+        if user_id is None:
             return {"items": [], "count": 0, "has_more": False}
         
-        # Join segments with chunks to get metadata, filter by user
-        query = (
-            db.query(models.Segment, models.Chunk)
-            .join(models.Chunk, models.Chunk.id == models.Segment.chunk_id)
-            .filter(models.Segment.kept == True)
-            .filter(models.Chunk.user_id == user.id)
-        )
+        # Segments, chunk metadata and address in one query, filtered by user
+        query = UTTERANCE_ROWS.where(models.Segment.user_id == user_id)
         
         if before_id is not None:
-            query = query.filter(models.Segment.id < before_id)
+            query = query.where(models.Segment.id < before_id)
         
         query = query.order_by(desc(models.Segment.id)).limit(limit)
-        rows = query.all()
+        rows = (await db.execute(query)).all()
         
-        items: List[schemas.UtteranceBubble] = []
-        for seg, chunk in rows:
-            # Resolve address if available
-            addr_row = db.query(models.Location).filter_by(chunk_id=chunk.id).first()
-            
-            items.append(schemas.UtteranceBubble(
-                id=seg.id,  # Include utterance ID for audio playback
-                chunk_id=chunk.id,
-                start_ms=seg.start_ms,
-                end_ms=seg.end_ms,
-                text=seg.text,
-                device_id=chunk.device_id,
-                timestamp=chunk.end_ts or chunk.start_ts or chunk.created_at,
-                address=addr_row.address if addr_row else None,
-            ))
+        # Plain dicts; the ORJSON response class serializes them in one pass
+        items = [_utterance_bubble(row) for row in rows]
         
         return {
-            "items": [item.model_dump() for item in items],
+            "items": items,
             "count": len(items),
             "has_more": len(items) == limit
         }
 
 
 @router.get("/search")
-def search_utterances(
+async def search_utterances(
     q: str = Query(..., min_length=1),
     limit: int = Query(50, ge=1, le=200),
     user_uid: Annotated[str, Depends(get_current_user_uid)] = None
@@ -80,8 +96,8 @@ def search_utterances(
     """
     Search utterances by text content.
     
-    In production, this would use full-text search (PostgreSQL FTS)
-    or Elasticsearch/OpenSearch for better performance.
+    Case-insensitive substring match, served by the pg_trgm GIN index
+    on segment text in PostgreSQL.
     
     Args:
         q: Search query
@@ -90,42 +106,27 @@ def search_utterances(
     Returns:
         Matching utterances
     """
-    with session_scope() as db:
+    async with session_scope() as db:
         # Get user
-        user = db.query(models.User).filter_by(uid=user_uid).first()
-        if not user:
+        user_id = await db.scalar(USER_ID_BY_UID, {"uid": user_uid})
+        if user_id is None:
             return {"items": [], "count": 0}
         
-        # Simple LIKE search (use FTS or Elasticsearch in production)
+        # ILIKE '%q%' uses the trigram index (ix_segments_text_trgm) instead of a full scan
         query = (
-            db.query(models.Segment, models.Chunk)
-            .join(models.Chunk, models.Chunk.id == models.Segment.chunk_id)
-            .filter(models.Segment.kept == True)
-            .filter(models.Chunk.user_id == user.id)
-            .filter(models.Segment.text.ilike(f"%{q}%"))
+            UTTERANCE_ROWS
+            .where(models.Segment.user_id == user_id)
+            .where(models.Segment.text.ilike(f"%{q}%"))
             .order_by(desc(models.Segment.id))
             .limit(limit)
         )
         
-        rows = query.all()
-        items: List[schemas.UtteranceBubble] = []
-        
-        for seg, chunk in rows:
-            addr_row = db.query(models.Location).filter_by(chunk_id=chunk.id).first()
-            
-            items.append(schemas.UtteranceBubble(
-                id=seg.id,  # Include utterance ID for audio playback
-                chunk_id=chunk.id,
-                start_ms=seg.start_ms,
-                end_ms=seg.end_ms,
-                text=seg.text,
-                device_id=chunk.device_id,
-                timestamp=chunk.end_ts or chunk.start_ts or chunk.created_at,
-                address=addr_row.address if addr_row else None,
-            ))
+        rows = (await db.execute(query)).all()
+        # Plain dicts; the ORJSON response class serializes them in one pass
+        items = [_utterance_bubble(row) for row in rows]
         
         return {
-            "items": [item.model_dump() for item in items],
+            "items": items,
             "count": len(items),
             "query": q
         }
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Request, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, exists, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, Any, Dict, List, Optional, Tuple
 from loguru import logger
-import json
 import numpy as np
+import orjson
 from app.db import session_scope
 from app import models
-from app.config import settings
-from app.services.assemblyai_client import verify_signature, extract_diarized_words, get_transcription
-from app.services.geocoding import reverse_geocode
+from app.config import Settings, get_settings
+from app.services.assemblyai_client import (
+    WordArrays,
+    verify_signature,
+    extract_diarized_words,
+    get_transcription,
+    words_to_arrays,
+)
+from app.services.geocoding import GEOCODE_PRECISION, geocode_key, reverse_geocode
+from app.services.enrollment_cache import get_enrollment_embedding
 from app.services.speaker_verification import (
     extract_embeddings_per_speaker,
     match_speaker_to_enrollment
@@ -18,7 +29,10 @@ router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
 
 @router.post("/assemblyai")
-async def assemblyai_webhook(request: Request):
+async def assemblyai_webhook(
+    request: Request,
+    settings: Annotated[Settings, Depends(get_settings)]
+):
     """
     Handle AssemblyAI transcription completion webhook.
     
@@ -51,32 +65,44 @@ async def assemblyai_webhook(request: Request):
     
     # Verify webhook signature (if configured)
     if settings.ASSEMBLYAI_WEBHOOK_SECRET and settings.ASSEMBLYAI_WEBHOOK_SECRET != "devsecret":
-        if not verify_signature(dict(request.headers), body, settings.ASSEMBLYAI_WEBHOOK_SECRET):
+        if not verify_signature(request.headers, body, settings.ASSEMBLYAI_WEBHOOK_SECRET):
             logger.warning("Webhook signature verification failed")
             raise HTTPException(status_code=401, detail="Invalid signature")
     
-    payload = await request.json()
+    # Decode the body already read for the signature check instead of re-reading it
+    payload = orjson.loads(body)
     
     transcript_id = payload.get("transcript_id") or payload.get("id")
     status = payload.get("status")
     
-    logger.info(f"Received webhook for transcript {transcript_id}, status: {status}")
+    logger.info("Received webhook for transcript {}, status: {}", transcript_id, status)
     
     # Check if transcription completed successfully
     if status != "completed":
-        logger.warning(f"Transcript {transcript_id} not completed: {status}")
+        logger.warning("Transcript {} not completed: {}", transcript_id, status)
         return {
             "status": "ignored",
             "reason": f"transcript_status_{status}",
             "transcript_id": transcript_id
         }
     
-    # Look up chunk by transcript_id
-    with session_scope() as lookup_db:
-        chunk = lookup_db.query(models.Chunk).filter_by(transcript_id=transcript_id).first()
+    # One session for the whole webhook. All lookups run before the commit below, which
+    # returns the connection to the pool; it is checked out again only for the inserts
+    async with session_scope() as db:
+        # Look up chunk by transcript_id
+        chunk = (await db.execute(
+            select(
+                models.Chunk.id,
+                models.Chunk.user_id,
+                models.Chunk.audio_url,
+                models.Chunk.gps_lat,
+                models.Chunk.gps_lon,
+            )
+            .where(models.Chunk.transcript_id == transcript_id)
+        )).first()
         
         if not chunk:
-            logger.error(f"No chunk found for transcript_id {transcript_id}")
+            logger.error("No chunk found for transcript_id {}", transcript_id)
             raise HTTPException(
                 status_code=404,
                 detail=f"No chunk found for transcript_id {transcript_id}"
@@ -85,11 +111,21 @@ async def assemblyai_webhook(request: Request):
         chunk_id = chunk.id
         user_id = chunk.user_id
         chunk_audio_url = chunk.audio_url
+        chunk_gps = (chunk.gps_lat, chunk.gps_lon)
         
         # Check if this chunk has already been processed (idempotency check)
-        existing_segments = lookup_db.query(models.Segment).filter_by(chunk_id=chunk_id).count()
-        if existing_segments > 0:
-            logger.warning(f"Chunk {chunk_id} already has {existing_segments} segments - skipping duplicate webhook")
+        # EXISTS stops at the first matching index entry instead of counting them all
+        already_processed = await db.scalar(
+            select(exists().where(models.Segment.chunk_id == chunk_id))
+        )
+        if already_processed:
+            # Only duplicate deliveries pay for the count
+            existing_segments = await db.scalar(
+                select(func.count()).where(models.Segment.chunk_id == chunk_id)
+            )
+            logger.warning(
+                "Chunk {} already has {} segments - skipping duplicate webhook", chunk_id, existing_segments
+            )
             return {
                 "status": "already_processed",
                 "chunk_id": chunk_id,
@@ -97,183 +133,294 @@ async def assemblyai_webhook(request: Request):
                 "transcript_id": transcript_id
             }
         
-        # Get enrollment to retrieve embedding
-        user = lookup_db.query(models.User).filter_by(id=user_id).first()
-        enrollment = lookup_db.query(models.Enrollment).filter_by(user_id=user_id).order_by(
-            models.Enrollment.created_at.desc()
-        ).first()
+        # Start fetching the full transcript now; it doesn't depend on the enrollment
+        # lookup or the audio file checks, so those run while it's in flight
+        logger.info("Fetching full transcript for {}", transcript_id)
+        transcript_task = asyncio.create_task(get_transcription(transcript_id))
+        try:
+            # Get enrollment embedding (cached per user across webhooks)
+            enrollment = await get_enrollment_embedding(db, user_id)
+            
+            if not enrollment:
+                logger.error("No enrollment found for user {}", user_id)
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No enrollment found for user {user_id}"
+                )
+            
+            enrollment_id, enrollment_embedding = enrollment
+            
+            if enrollment_embedding is None:
+                logger.error("No embedding vector in enrollment {}", enrollment_id)
+                raise HTTPException(
+                    status_code=500,
+                    detail="Enrollment missing embedding vector. Please re-enroll."
+                )
+            
+            # Location lookups run now too, so geocoding later never needs the session
+            needs_address, address = await _lookup_known_address(db, chunk_id, user_id, *chunk_gps)
+            
+            # End the lookup transaction so the connection returns to the pool while we
+            # fetch the transcript, run inference and geocode; the same session is reused below
+            await db.commit()
+            
+            logger.info("Found chunk {} for user {}", chunk_id, user_id)
+            
+            logger.info("Loaded enrollment embedding: {}", enrollment_embedding.shape)
+            
+            chunk_audio_path = local_path(chunk_audio_url)
+            if not chunk_audio_path.exists():
+                logger.error("Chunk audio not found: {}", chunk_audio_path)
+                raise HTTPException(status_code=404, detail="Chunk audio file not found")
+        except BaseException:
+            transcript_task.cancel()
+            raise
         
-        if not enrollment:
-            logger.error(f"No enrollment found for user {user_id}")
+        try:
+            full_transcript = await transcript_task
+            logger.info("Fetched transcript: {} words", len(full_transcript.get('words', [])))
+        except Exception as e:
+            logger.error("Error fetching transcript {}: {}", transcript_id, e)
             raise HTTPException(
-                status_code=404,
-                detail=f"No enrollment found for user {user_id}"
+                status_code=500,
+                detail=f"Failed to fetch transcript: {e}"
             )
         
-        # Extract data from enrollment BEFORE session closes
-        enrollment_id = enrollment.id
-        enrollment_embedding_json = enrollment.embedding_vector
+        # Extract diarized words from the full transcript
+        words = extract_diarized_words(full_transcript)
         
-        if not enrollment_embedding_json:
-            logger.error(f"No embedding vector in enrollment {enrollment_id}")
-            raise HTTPException(
-                status_code=500,
-                detail="Enrollment missing embedding vector. Please re-enroll."
+        if not words:
+            logger.warning("No words in transcript {}", transcript_id)
+            return {
+                "status": "ignored",
+                "reason": "no_words",
+                "chunk_id": chunk_id
+            }
+        
+        logger.info("Processing {} words for chunk {}", len(words), chunk_id)
+        
+        # Extract embeddings for each speaker in the chunk
+        logger.info("Extracting embeddings per speaker...")
+        # Model inference and similarity scoring are CPU-bound; run them in the threadpool
+        speaker_embeddings = await run_in_threadpool(
+            extract_embeddings_per_speaker, chunk_audio_path, words, min_duration_ms=1000
+        )
+        
+        if not speaker_embeddings:
+            logger.warning("No speakers found in chunk with sufficient duration")
+            return {
+                "status": "ignored",
+                "reason": "no_valid_speakers",
+                "chunk_id": chunk_id
+            }
+        
+        # Match speakers to enrollment using embeddings (a single small matmul, so inline)
+        matched_speaker = match_speaker_to_enrollment(
+            enrollment_embedding,
+            speaker_embeddings,
+            threshold=0.25  # Lowered to capture short utterances and environmental variance
+        )
+        
+        if not matched_speaker:
+            logger.warning("No speaker matched enrollment for chunk {}", chunk_id)
+            return {
+                "status": "ignored",
+                "reason": "no_matching_speaker",
+                "chunk_id": chunk_id
+            }
+        
+        logger.info("Matched speaker: {}", matched_speaker)
+        
+        # Only geocode chunks that will be stored, and with no connection checked out
+        if needs_address and address is None:
+            address = await _geocode_chunk(chunk_id, *chunk_gps)
+        
+        # Filter words to keep only from matched speaker (one vectorized compare)
+        word_arrays = words_to_arrays(words)
+        user_words = word_arrays.select(word_arrays.speakers == matched_speaker)
+        logger.info("Found {} words from matched speaker", len(user_words.starts))
+        
+        # Group words into segments (merge close words) and keep long-enough ones
+        kept_segments = _group_words_into_segments(
+            user_words,
+            gap_ms=settings.SEGMENT_GAP_MS,
+            min_ms=settings.SEGMENT_MIN_MS,
+            min_chars=settings.SEGMENT_MIN_CHARS,
+        )
+        # One lazily built DEBUG line instead of a formatted INFO line per segment
+        logger.opt(lazy=True).debug(
+            "  Kept segments: {}",
+            lambda: "; ".join(
+                f"{seg['end_ms'] - seg['start_ms']}ms \"{seg['text'][:50]}...\"" for seg in kept_segments
+            ),
+        )
+        
+        user_label = matched_speaker
+        
+        logger.info("Found {} user segments for chunk {}", len(kept_segments), chunk_id)
+        
+        # Persist segments keyed by the chunk_id found above (GPS was captured there too).
+        # Store all kept segments in one executemany INSERT
+        if kept_segments:
+            await db.execute(
+                insert(models.Segment),
+                [
+                    {
+                        "chunk_id": chunk_id,
+                        "user_id": user_id,
+                        "speaker_label": user_label,
+                        "start_ms": seg["start_ms"],
+                        "end_ms": seg["end_ms"],
+                        "text": seg["text"],
+                        "confidence": seg.get("avg_conf"),
+                        "kept": True,
+                    }
+                    for seg in kept_segments
+                ],
             )
         
-    logger.info(f"Found chunk {chunk_id} for user {user_id}")
+        logger.info("Stored {} segments for chunk {}", len(kept_segments), chunk_id)
+        
+        if address:
+            db.add(models.Location(chunk_id=chunk_id, address=address, source="geocoder"))
+            logger.info("Geocoded location for chunk {}: {}", chunk_id, address)
     
-    # Parse enrollment embedding (outside session, but we have the JSON data)
-    enrollment_embedding = np.array(json.loads(enrollment_embedding_json))
-    logger.info(f"Loaded enrollment embedding: {enrollment_embedding.shape}")
+    return {
+        "status": "ok",
+        "chunk_id": chunk_id,
+        "kept_count": len(kept_segments),
+        "user_label": user_label,
+        "transcript_id": transcript_id
+    }
+
+
+async def _lookup_known_address(
+    db: AsyncSession,
+    chunk_id: int,
+    user_id: int,
+    lat: Optional[float],
+    lon: Optional[float]
+) -> Tuple[bool, Optional[str]]:
+    """
+    Check whether a chunk needs a geocoder Location and whether its address is already known.
     
-    # Fetch the full transcript from AssemblyAI
-    logger.info(f"Fetching full transcript for {transcript_id}")
-    try:
-        full_transcript = await get_transcription(transcript_id)
-        logger.info(f"Fetched transcript: {len(full_transcript.get('words', []))} words")
-    except Exception as e:
-        logger.error(f"Error fetching transcript {transcript_id}: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to fetch transcript: {e}"
-        )
+    Args:
+        db: Open database session
+        chunk_id: Chunk being processed
+        user_id: Owner of the chunk
+        lat: Chunk latitude, if recorded
+        lon: Chunk longitude, if recorded
     
-    # Extract diarized words from the full transcript
-    words = extract_diarized_words(full_transcript)
+    Returns:
+        (needs_address, address): needs_address is False when the chunk has no GPS or
+        already has a Location; address is one resolved earlier for this user in the
+        same geocode cell, or None if it still has to be geocoded
+    """
+    if lat is None or lon is None:
+        return False, None
     
-    if not words:
-        logger.warning(f"No words in transcript {transcript_id}")
-        return {
-            "status": "ignored",
-            "reason": "no_words",
-            "chunk_id": chunk_id
-        }
+    # Check if location already exists
+    existing_location = await db.scalar(
+        select(models.Location.id).where(models.Location.chunk_id == chunk_id)
+    )
+    if existing_location is not None:
+        return False, None
     
-    logger.info(f"Processing {len(words)} words for chunk {chunk_id}")
+    # Reuse an address already resolved for this user at the same spot
+    return True, await _find_nearby_address(db, user_id, lat, lon)
+
+
+async def _geocode_chunk(chunk_id: int, lat: float, lon: float) -> Optional[str]:
+    """
+    Reverse geocode a chunk's coordinates.
     
-    # Extract embeddings for each speaker in the chunk
-    chunk_audio_path = local_path(chunk_audio_url)
-    if not chunk_audio_path.exists():
-        logger.error(f"Chunk audio not found: {chunk_audio_path}")
-        raise HTTPException(status_code=404, detail="Chunk audio file not found")
+    Errors are logged rather than raised so a geocoder failure never fails the webhook.
     
-    logger.info("Extracting embeddings per speaker...")
-    speaker_embeddings = extract_embeddings_per_speaker(chunk_audio_path, words, min_duration_ms=1000)
+    Returns:
+        Address, or None if geocoding failed
+    """
+    try:
+        return await reverse_geocode(lat, lon)
+    except Exception as e:
+        logger.error("Geocoding failed for chunk {}: {}", chunk_id, e)
+        return None
+
+
+async def _find_nearby_address(
+    db: AsyncSession,
+    user_id: int,
+    lat: float,
+    lon: float
+) -> Optional[str]:
+    """
+    Find a geocoded address on another of the user's chunks in the same geocode cell.
     
-    if not speaker_embeddings:
-        logger.warning("No speakers found in chunk with sufficient duration")
-        return {
-            "status": "ignored",
-            "reason": "no_valid_speakers",
-            "chunk_id": chunk_id
-        }
+    Args:
+        db: Open database session
+        user_id: Owner of the chunk being geocoded
+        lat: Latitude
+        lon: Longitude
     
-    # Match speakers to enrollment using embeddings
-    matched_speaker = match_speaker_to_enrollment(
-        enrollment_embedding,
-        speaker_embeddings,
-        threshold=0.25  # Lowered to capture short utterances and environmental variance
+    Returns:
+        Previously stored address, or None if no nearby chunk was geocoded
+    """
+    key_lat, key_lon = geocode_key(lat, lon)
+    half_cell = 0.5 * 10 ** -GEOCODE_PRECISION
+    return await db.scalar(
+        select(models.Location.address)
+        .join(models.Chunk, models.Location.chunk_id == models.Chunk.id)
+        .where(
+            models.Chunk.user_id == user_id,
+            models.Chunk.gps_lat.between(key_lat - half_cell, key_lat + half_cell),
+            models.Chunk.gps_lon.between(key_lon - half_cell, key_lon + half_cell),
+            models.Location.source == "geocoder",
+        )
+        .limit(1)
     )
+
+
+def _group_words_into_segments(
+    words: WordArrays,
+    gap_ms: int,
+    min_ms: int,
+    min_chars: int
+) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive words into segments and keep those that are long enough.
     
-    if not matched_speaker:
-        logger.warning(f"No speaker matched enrollment for chunk {chunk_id}")
-        return {
-            "status": "ignored",
-            "reason": "no_matching_speaker",
-            "chunk_id": chunk_id
-        }
-    
-    logger.info(f"Matched speaker: {matched_speaker}")
-    
-    # Filter words to keep only from matched speaker
-    user_words = [w for w in words if w["speaker"] == matched_speaker]
-    logger.info(f"Found {len(user_words)} words from matched speaker")
+    Words are merged while the gap to the previous word is at most gap_ms.
+    Boundaries and per-segment stats are computed with NumPy; text is only
+    joined for segments that pass the duration filter.
     
-    # Group words into segments (merge close words)
-    segments = []
-    current_segment = []
-    GAP_MS = settings.SEGMENT_GAP_MS
+    Args:
+        words: Time-ordered words as parallel arrays
+        gap_ms: Maximum silence between words of one segment
+        min_ms: Minimum segment duration to keep
+        min_chars: Minimum segment text length to keep
     
-    for word in user_words:
-        if not current_segment:
-            current_segment = [word]
-        elif word["start"] - current_segment[-1]["end"] <= GAP_MS:
-            current_segment.append(word)
-        else:
-            segments.append(current_segment)
-            current_segment = [word]
+    Returns:
+        Kept segments as dicts with start_ms, end_ms, text and avg_conf
+    """
+    starts, ends, confs, _, texts = words
+    n = len(starts)
+    if n == 0:
+        return []
     
-    if current_segment:
-        segments.append(current_segment)
+    # A new segment starts wherever the gap to the previous word exceeds gap_ms
+    cuts = np.flatnonzero(starts[1:] - ends[:-1] > gap_ms) + 1
+    bounds = np.concatenate(([0], cuts, [n]))
+    seg_starts = starts[bounds[:-1]]
+    seg_ends = ends[bounds[1:] - 1]
+    avg_confs = np.add.reduceat(confs, bounds[:-1]) / np.diff(bounds)
     
-    # Filter segments by duration and length
-    kept_segments = []
-    for seg in segments:
-        start_ms = seg[0]["start"]
-        end_ms = seg[-1]["end"]
-        duration = end_ms - start_ms
-        text = " ".join(w["text"] for w in seg)
-        
-        if duration >= settings.SEGMENT_MIN_MS and len(text) >= settings.SEGMENT_MIN_CHARS:
-            kept_segments.append({
-                "start_ms": start_ms,
-                "end_ms": end_ms,
+    kept = []
+    for i in np.flatnonzero(seg_ends - seg_starts >= min_ms):
+        text = " ".join(texts[bounds[i]:bounds[i + 1]])
+        if len(text) >= min_chars:
+            kept.append({
+                "start_ms": int(seg_starts[i]),
+                "end_ms": int(seg_ends[i]),
                 "text": text,
-                "avg_conf": sum(w.get("confidence", 1.0) for w in seg) / len(seg)
+                "avg_conf": float(avg_confs[i]),
             })
-            logger.info(f"  ✓ Segment: {duration}ms, \"{text[:50]}...\"")
-    
-    user_label = matched_speaker
-    
-    logger.info(f"Found {len(kept_segments)} user segments for chunk {chunk_id}")
-    
-    # Persist segments to database
-    with session_scope() as db:
-        # Verify chunk exists
-        chunk = db.query(models.Chunk).filter_by(id=chunk_id).first()
-        if not chunk:
-            logger.error(f"Chunk {chunk_id} not found in database")
-            raise HTTPException(status_code=404, detail=f"Chunk {chunk_id} not found")
-        
-        # Store each kept segment
-        for seg in kept_segments:
-            segment = models.Segment(
-                chunk_id=chunk_id,
-                speaker_label=user_label,
-                start_ms=seg["start_ms"],
-                end_ms=seg["end_ms"],
-                text=seg["text"],
-                confidence=seg.get("avg_conf"),
-                kept=True,
-            )
-            db.add(segment)
-        
-        logger.info(f"Stored {len(kept_segments)} segments for chunk {chunk_id}")
-        
-        # Trigger geocoding if GPS coordinates present
-        if chunk.gps_lat is not None and chunk.gps_lon is not None:
-            # Check if location already exists
-            existing_location = db.query(models.Location).filter_by(chunk_id=chunk_id).first()
-            if not existing_location:
-                try:
-                    address = await reverse_geocode(chunk.gps_lat, chunk.gps_lon)
-                    if address:
-                        location = models.Location(
-                            chunk_id=chunk_id,
-                            address=address,
-                            source="geocoder"
-                        )
-                        db.add(location)
-                        logger.info(f"Geocoded location for chunk {chunk_id}: {address}")
-                except Exception as e:
-                    logger.error(f"Geocoding failed for chunk {chunk_id}: {e}")
-    
-    return {
-        "status": "ok",
-        "chunk_id": chunk_id,
-        "kept_count": len(kept_segments),
-        "user_label": user_label,
-        "transcript_id": transcript_id
-    }
-
+    return kept
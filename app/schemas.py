@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel
+from typing import Optional, TypedDict
 from datetime import datetime
 
 
@@ -19,7 +19,10 @@ class ChunkSubmit(BaseModel):
     gps_lon: Optional[float] = None
 
 
-class SegmentOut(BaseModel):
+# Outbound shapes are TypedDicts: endpoints build them from trusted DB rows and
+# the ORJSON response class serializes them directly, so there is no per-row
+# pydantic validation. BaseModel is kept for inbound bodies above.
+class SegmentOut(TypedDict):
     id: int
     chunk_id: int
     start_ms: int
@@ -27,11 +30,17 @@ class SegmentOut(BaseModel):
     text: str
     confidence: Optional[float]
 
-    class Config:
-        from_attributes = True
+
+class ChunkSegmentOut(TypedDict):
+    """A kept segment as listed under GET /chunks/{chunk_id} (the chunk id is on the parent)."""
+    id: int
+    start_ms: int
+    end_ms: int
+    text: str
+    confidence: Optional[float]
 
 
-class UtteranceBubble(BaseModel):
+class UtteranceBubble(TypedDict):
     id: int  # Utterance ID for audio playback
     chunk_id: int
     start_ms: int
@@ -40,4 +49,3 @@ class UtteranceBubble(BaseModel):
     device_id: Optional[str]
     timestamp: Optional[datetime]
     address: Optional[str]
-
@@ -6,11 +6,17 @@ Documentation: https://www.assemblyai.com/docs
 
 import hmac
 import hashlib
+import anyio
+from functools import lru_cache
+from operator import itemgetter
 import httpx
+import numpy as np
+import orjson
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Dict, List, Mapping, NamedTuple, Optional
 from loguru import logger
-from app.config import settings
+from app.config import get_settings
 
 
 # AssemblyAI API endpoints
@@ -18,8 +24,44 @@ ASSEMBLYAI_API_BASE = "https://api.assemblyai.com/v2"
 UPLOAD_ENDPOINT = f"{ASSEMBLYAI_API_BASE}/upload"
 TRANSCRIPT_ENDPOINT = f"{ASSEMBLYAI_API_BASE}/transcript"
 
+# Longest slice of an error response body written to the log
+ERROR_BODY_LOG_BYTES = 2048
 
-def verify_signature(headers: Dict[str, str], body: bytes, secret: str) -> bool:
+# Read size for streaming uploads: bounded memory, few syscalls/thread hops per file
+UPLOAD_STREAM_CHUNK_BYTES = 1024 * 1024
+
+# Fixed transcription options, merged into every submit payload (read-only view)
+_PAYLOAD_TEMPLATE: Mapping[str, Any] = MappingProxyType({
+    # Enable speaker diarization
+    "speaker_labels": True,
+    # Request word-level timestamps and speaker info
+    "format_text": False,
+})
+
+# One pooled client per process so successive calls reuse keep-alive TCP/TLS connections.
+# Timeouts are set per request (uploads need far longer than JSON calls).
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared AssemblyAI HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        )
+    return _http_client
+
+
+async def close_client() -> None:
+    """Close the shared HTTP client (called on app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def verify_signature(headers: Mapping[str, str], body: bytes, secret: str) -> bool:
     """
     Verify AssemblyAI webhook signature.
     
@@ -27,7 +69,7 @@ def verify_signature(headers: Dict[str, str], body: bytes, secret: str) -> bool:
     "x-assemblyai-signature" header.
     
     Args:
-        headers: Request headers dict
+        headers: Request headers mapping (e.g. Starlette's case-insensitive Headers)
         body: Raw request body bytes
         secret: Webhook secret for HMAC verification
     
@@ -39,15 +81,14 @@ def verify_signature(headers: Dict[str, str], body: bytes, secret: str) -> bool:
         logger.warning("No signature found in webhook headers")
         return False
     
-    # Compute expected signature
-    expected = hmac.new(
-        secret.encode('utf-8'),
-        body,
-        hashlib.sha256
-    ).hexdigest()
+    # Copy the pre-keyed HMAC (key padding/hashing done once per secret) and hash
+    # the raw body bytes with hashlib's OpenSSL SHA-256
+    mac = _hmac_template(secret).copy()
+    mac.update(body)
     
-    # Constant-time comparison to prevent timing attacks
-    is_valid = hmac.compare_digest(signature, expected)
+    # Constant-time comparison to prevent timing attacks. Only the exact lowercase
+    # hex digest matches; compared as bytes so a non-ASCII header can't raise TypeError
+    is_valid = hmac.compare_digest(mac.hexdigest().encode(), signature.encode())
     
     if not is_valid:
         logger.warning("Webhook signature verification failed")
@@ -55,6 +96,12 @@ def verify_signature(headers: Dict[str, str], body: bytes, secret: str) -> bool:
     return is_valid
 
 
+@lru_cache(maxsize=4)
+def _hmac_template(secret: str) -> "hmac.HMAC":
+    """Return an HMAC-SHA256 object keyed with secret and no data, for copy()."""
+    return hmac.new(secret.encode('utf-8'), None, hashlib.sha256)
+
+
 async def upload_audio_file(file_path: Path) -> str:
     """
     Upload audio file to AssemblyAI.
@@ -69,31 +116,41 @@ async def upload_audio_file(file_path: Path) -> str:
         httpx.HTTPError: If upload fails
         ValueError: If API key is not configured
     """
+    settings = get_settings()
     if not settings.ASSEMBLYAI_API_KEY:
         raise ValueError("ASSEMBLYAI_API_KEY not configured")
     
     logger.info(f"Uploading audio file: {file_path}")
     
+    # Explicit length so the body is sent as a plain (not chunked) stream
     headers = {
-        "authorization": settings.ASSEMBLYAI_API_KEY
+        "authorization": settings.ASSEMBLYAI_API_KEY,
+        "content-length": str(file_path.stat().st_size)
     }
     
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        with open(file_path, 'rb') as f:
-            response = await client.post(
-                UPLOAD_ENDPOINT,
-                headers=headers,
-                content=f.read()
-            )
-            response.raise_for_status()
-            data = response.json()
-            upload_url = data.get("upload_url")
-            
-            if not upload_url:
-                raise ValueError("No upload_url in response")
-            
-            logger.info(f"Audio uploaded successfully: {upload_url}")
-            return upload_url
+    client = _get_client()
+    response = await client.post(
+        UPLOAD_ENDPOINT,
+        headers=headers,
+        content=_iter_file(file_path),
+        timeout=httpx.Timeout(300.0, connect=10.0)
+    )
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    upload_url = data.get("upload_url")
+    
+    if not upload_url:
+        raise ValueError("No upload_url in response")
+    
+    logger.info(f"Audio uploaded successfully: {upload_url}")
+    return upload_url
+
+
+async def _iter_file(file_path: Path) -> AsyncIterator[bytes]:
+    """Yield a file in UPLOAD_STREAM_CHUNK_BYTES pieces, reading in worker threads."""
+    async with await anyio.open_file(file_path, 'rb') as f:
+        while chunk := await f.read(UPLOAD_STREAM_CHUNK_BYTES):
+            yield chunk
 
 
 async def submit_transcription(
@@ -126,6 +183,7 @@ async def submit_transcription(
         httpx.HTTPError: If submission fails
         ValueError: If API key is not configured
     """
+    settings = get_settings()
     if not settings.ASSEMBLYAI_API_KEY:
         raise ValueError("ASSEMBLYAI_API_KEY not configured")
     
@@ -143,41 +201,38 @@ async def submit_transcription(
     # Build payload - metadata must be stored separately and retrieved later
     # AssemblyAI doesn't support custom_metadata in the way we need, so we'll
     # need to track transcription_id -> metadata mapping in our database
-    payload = {
-        "audio_url": audio_url,
-        # Enable speaker diarization
-        "speaker_labels": True,
-        # Request word-level timestamps and speaker info
-        "format_text": False,
-    }
+    payload = {"audio_url": audio_url, **_PAYLOAD_TEMPLATE}
     
     # Add webhook URL if provided
     if webhook_url:
         payload["webhook_url"] = webhook_url
     
-    logger.info(f"Payload: {payload}")
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
-            TRANSCRIPT_ENDPOINT,
-            headers=headers,
-            json=payload
-        )
-        
-        # Log response for debugging
-        if response.status_code != 200:
-            logger.error(
-                f"AssemblyAI API error {response.status_code}: {response.text}"
-            )
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        logger.info(
-            f"Transcription submitted: {data.get('id')}, status: {data.get('status')}"
+    logger.info("Payload: {}", payload)
+    
+    client = _get_client()
+    response = await client.post(
+        TRANSCRIPT_ENDPOINT,
+        headers=headers,
+        content=orjson.dumps(payload),
+        timeout=30.0
+    )
+    
+    # Log response for debugging (truncated raw body, formatted only if ERROR is enabled)
+    if response.status_code != 200:
+        logger.error(
+            "AssemblyAI API error {}: {}",
+            response.status_code,
+            response.content[:ERROR_BODY_LOG_BYTES].decode("utf-8", "replace")
         )
-        
-        return data
+    
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    
+    logger.info(
+        f"Transcription submitted: {data.get('id')}, status: {data.get('status')}"
+    )
+    
+    return data
 
 
 async def get_transcription(transcript_id: str) -> Dict[str, Any]:
@@ -196,6 +251,7 @@ async def get_transcription(transcript_id: str) -> Dict[str, Any]:
         httpx.HTTPError: If request fails
         ValueError: If API key is not configured
     """
+    settings = get_settings()
     if not settings.ASSEMBLYAI_API_KEY:
         raise ValueError("ASSEMBLYAI_API_KEY not configured")
     
@@ -205,10 +261,11 @@ async def get_transcription(transcript_id: str) -> Dict[str, Any]:
     
     url = f"{TRANSCRIPT_ENDPOINT}/{transcript_id}"
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    client = _get_client()
+    response = await client.get(url, headers=headers, timeout=30.0)
+    response.raise_for_status()
+    # Transcripts carry thousands of words; orjson decodes them several times faster
+    return orjson.loads(response.content)
 
 
 def extract_diarized_words(transcript_data: Dict[str, Any]) -> list:
@@ -225,17 +282,64 @@ def extract_diarized_words(transcript_data: Dict[str, Any]) -> list:
             ...
         ]
     """
-    words = transcript_data.get("words", [])
-    
     # Transform AssemblyAI format to our internal format
-    result = []
-    for word in words:
-        result.append({
+    return [
+        {
             "start": word.get("start", 0),
             "end": word.get("end", 0),
             "speaker": word.get("speaker", "UNKNOWN"),
             "confidence": word.get("confidence", 1.0),
             "text": word.get("text", "")
-        })
+        }
+        for word in transcript_data.get("words", [])
+    ]
+
+
+# Required word fields, fetched together (confidence is optional and defaults to 1.0)
+_WORD_FIELDS = itemgetter("start", "end", "speaker", "text")
+
+
+class WordArrays(NamedTuple):
+    """Diarized words as parallel arrays (one entry per word, in time order)."""
+    starts: np.ndarray       # int64 ms
+    ends: np.ndarray         # int64 ms
+    confidences: np.ndarray  # float64
+    speakers: np.ndarray     # object array of the original labels (str, int or None)
+    texts: np.ndarray        # object array of str
+    
+    def select(self, mask: np.ndarray) -> "WordArrays":
+        """Return the words where mask is true."""
+        return WordArrays(*(column[mask] for column in self))
+
+
+def words_to_arrays(words: List[Dict[str, Any]]) -> WordArrays:
+    """
+    Convert words from extract_diarized_words() into parallel arrays.
+    
+    Lets callers filter by speaker with one vectorized compare instead of
+    walking the word dicts, e.g. words.select(words.speakers == "A").
     
-    return result
+    Args:
+        words: Words with start, end, speaker, confidence and text
+    
+    Returns:
+        WordArrays with one entry per word
+    """
+    n = len(words)
+    # One C-level multi-key lookup per word, then transpose into columns
+    starts, ends, speakers, word_texts = zip(*map(_WORD_FIELDS, words)) if n else ((), (), (), ())
+    # Object arrays keep each value as-is; a str array would turn an int label 0
+    # into "0" and None into "None"
+    labels = np.empty(n, dtype=object)
+    labels[:] = speakers
+    texts = np.empty(n, dtype=object)
+    texts[:] = word_texts
+    return WordArrays(
+        starts=np.array(starts, dtype=np.int64),
+        ends=np.array(ends, dtype=np.int64),
+        confidences=np.fromiter(
+            (w.get("confidence", 1.0) for w in words), dtype=np.float64, count=n
+        ),
+        speakers=labels,
+        texts=texts,
+    )
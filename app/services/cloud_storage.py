@@ -6,14 +6,18 @@ Supports both local filesystem (development) and Cloudinary (production).
 
 from pathlib import Path
 from typing import Optional, BinaryIO
+from urllib.parse import urlparse
+import tempfile
 import cloudinary
 import cloudinary.uploader
 from loguru import logger
-from app.config import settings
+from app.config import get_settings
+import httpx
 import os
 
 
 # Initialize Cloudinary if enabled
+settings = get_settings()
 if settings.USE_CLOUDINARY:
     if not all([settings.CLOUDINARY_CLOUD_NAME, settings.CLOUDINARY_API_KEY, settings.CLOUDINARY_API_SECRET]):
         logger.warning("Cloudinary credentials incomplete - using local storage as fallback")
@@ -27,6 +31,12 @@ if settings.USE_CLOUDINARY:
         )
         logger.info(f"Cloudinary initialized: {settings.CLOUDINARY_CLOUD_NAME}")
 
+# Read size for streamed downloads
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# Pooled client shared by all downloads
+_download_client: Optional[httpx.Client] = None
+
 
 def upload_audio_file(file_path: Path, public_id: Optional[str] = None) -> str:
     """
@@ -106,12 +116,13 @@ def _download_from_cloudinary(url: str) -> Path:
     """
     Download file from Cloudinary to temporary location.
     
+    The body is streamed to a temporary file in DOWNLOAD_CHUNK_BYTES pieces and
+    renamed into place, so memory stays bounded and concurrent downloads of the
+    same file never expose a partial copy.
+    
     Returns:
         Local path to downloaded file
     """
-    import httpx
-    from urllib.parse import urlparse
-    
     try:
         # Create temp directory
         temp_dir = Path(settings.STORAGE_ROOT) / "temp" / "downloads"
@@ -125,11 +136,16 @@ def _download_from_cloudinary(url: str) -> Path:
         # Download if not already cached
         if not local_path.exists():
             logger.info(f"Downloading from Cloudinary: {url}")
-            response = httpx.get(url)
-            response.raise_for_status()
-            
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
+            fd, tmp_name = tempfile.mkstemp(dir=temp_dir, prefix=f".{filename}.", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f, _get_download_client().stream("GET", url) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_bytes(DOWNLOAD_CHUNK_BYTES):
+                        f.write(chunk)
+                os.replace(tmp_name, local_path)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
             
             logger.info(f"Downloaded to: {local_path}")
         
@@ -140,6 +156,25 @@ def _download_from_cloudinary(url: str) -> Path:
         raise
 
 
+def _get_download_client() -> httpx.Client:
+    """Return the shared download client (created lazily; keeps TCP/TLS connections alive)."""
+    global _download_client
+    if _download_client is None:
+        _download_client = httpx.Client(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+        )
+    return _download_client
+
+
+def close_client() -> None:
+    """Close the shared download client (called on app shutdown)."""
+    global _download_client
+    if _download_client is not None:
+        _download_client.close()
+        _download_client = None
+
+
 def delete_audio_file(url_or_path: str) -> bool:
     """
     Delete an audio file from storage.
@@ -176,7 +211,6 @@ def _delete_from_cloudinary(url: str) -> bool:
     try:
         # Extract public_id from URL
         # URL format: https://res.cloudinary.com/{cloud_name}/raw/upload/{folder}/{public_id}.ext
-        from urllib.parse import urlparse
         parsed = urlparse(url)
         path_parts = parsed.path.split('/')
         
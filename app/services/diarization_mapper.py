@@ -1,9 +1,13 @@
-from collections import defaultdict
-from typing import Any, List, Dict
-from app.config import settings
+from typing import Any, List, Dict, Tuple, Union
+import numpy as np
+from loguru import logger
+from app.config import get_settings
+from app.services.assemblyai_client import WordArrays, words_to_arrays
+from app.utils.jit import NUMBA_AVAILABLE, njit
 
 # Expected STT words schema (per word):
 # {"start": int_ms, "end": int_ms, "speaker": "SPEAKER_00", "confidence": float, "text": str}
+# Words may also be passed already converted to parallel arrays (WordArrays).
 
 
 class MapResult(dict):
@@ -11,28 +15,53 @@ class MapResult(dict):
     pass
 
 
-def map_enrollment_anchored(stt_words: List[Dict[str, Any]], enroll_ms: int) -> MapResult:
+def map_enrollment_anchored(
+    stt_words: Union[List[Dict[str, Any]], WordArrays],
+    enroll_ms: int
+) -> MapResult:
     """
     Maps diarized words to user segments using enrollment-anchored approach.
     
     Args:
-        stt_words: List of word dictionaries from STT with diarization
+        stt_words: Word dictionaries from STT with diarization, or the same words as WordArrays
         enroll_ms: Duration of enrollment audio in milliseconds
     
     Returns:
         MapResult with status='ok' and kept segments, or status='indeterminate' with reason
     """
+    settings = get_settings()
     PAD_MS = settings.PAD_MS
     ENROLL_DOM = settings.ENROLL_DOMINANCE
     GAP = settings.SEGMENT_GAP_MS
     MIN_MS = settings.SEGMENT_MIN_MS
     MIN_CHARS = settings.SEGMENT_MIN_CHARS
 
+    # Work on parallel arrays (one column per field) instead of per-word dicts
+    words = stt_words if isinstance(stt_words, WordArrays) else words_to_arrays(stt_words)
+    starts, ends, confs, speakers, texts = words
+    
+    # Small integer id per speaker label for the array kernels. Labels are interned
+    # by first appearance rather than np.unique, which can't order mixed types
+    # (e.g. int and None labels) and would otherwise need them coerced to str
+    label_ids: Dict[Any, int] = {}
+    speaker_ids = np.fromiter(
+        (label_ids.setdefault(s, len(label_ids)) for s in speakers.tolist()),
+        dtype=np.int64, count=len(speakers),
+    )
+    labels = list(label_ids)
+    
+    # Word selections for the enrollment [0, enroll_ms) and chunk [enroll_ms + PAD_MS, ...) regions
+    chunk_start = enroll_ms + PAD_MS
+    enroll_sel, chunk_sel = _region_selections(starts, enroll_ms, chunk_start)
+    chunk_ids = speaker_ids[chunk_sel]
+    
+    # One pass over each region's words collects the enrollment and chunk stats
+    label_totals, enroll_first, chunk_counts, chunk_first = _region_stats(
+        speaker_ids[enroll_sel], ends[enroll_sel] - starts[enroll_sel], chunk_ids, len(labels)
+    )
+    
     # 1) Determine dominant label in enrollment window
-    label_time: Dict[str, int] = defaultdict(int)
-    for w in stt_words:
-        if w["start"] < enroll_ms:
-            label_time[w["speaker"]] += (w["end"] - w["start"])
+    label_time = _by_first_seen(labels, label_totals, enroll_first)
     
     if not label_time:
         return MapResult(status="indeterminate", reason="no_enrollment_words")
@@ -46,13 +75,20 @@ def map_enrollment_anchored(stt_words: List[Dict[str, Any]], enroll_ms: int) ->
         for spk, time in label_time.items()
     }
     
-    from loguru import logger
-    logger.info(f"Enrollment region analysis (0-{enroll_ms}ms):")
-    logger.info(f"  Total speech time: {total_time}ms / {enroll_ms}ms ({total_time/enroll_ms*100:.1f}%)")
-    for spk, pct in sorted(speaker_percentages.items(), key=lambda x: -x[1]):
-        logger.info(f"  {spk}: {label_time[spk]}ms ({pct:.1f}%)")
-    logger.info(f"  Dominant: {user_label} ({dom_time}ms, {dom_time/enroll_ms*100:.1f}%)")
-    logger.info(f"  Required: {ENROLL_DOM*100:.0f}% of enrollment duration")
+    # Brace-style args are only formatted when a sink accepts the level; the
+    # per-speaker breakdown is built lazily and only at DEBUG
+    logger.info(
+        "Enrollment region (0-{}ms): speech {}ms ({:.1f}%), dominant {} ({}ms, {:.1f}%), required {:.0f}%",
+        enroll_ms, total_time, total_time / enroll_ms * 100,
+        user_label, dom_time, dom_time / enroll_ms * 100, ENROLL_DOM * 100,
+    )
+    logger.opt(lazy=True).debug(
+        "  Enrollment speakers: {}",
+        lambda: ", ".join(
+            f"{spk} {label_time[spk]}ms ({pct:.1f}%)"
+            for spk, pct in sorted(speaker_percentages.items(), key=lambda x: -x[1])
+        ),
+    )
     
     if dom_time < int(ENROLL_DOM * enroll_ms):
         return MapResult(
@@ -68,81 +104,195 @@ def map_enrollment_anchored(stt_words: List[Dict[str, Any]], enroll_ms: int) ->
         )
 
     # 2) Collect words in CHUNK region for user label
-    chunk_start = enroll_ms + PAD_MS
-    
     # Debug: Show all speakers in chunk region
-    chunk_words_by_speaker: Dict[str, int] = defaultdict(int)
-    for w in stt_words:
-        if w["start"] >= chunk_start:
-            chunk_words_by_speaker[w["speaker"]] += 1
-    
-    logger.info(f"Chunk region analysis ({chunk_start}ms onwards):")
-    logger.info(f"  Total words in chunk: {sum(chunk_words_by_speaker.values())}")
-    for spk, count in sorted(chunk_words_by_speaker.items(), key=lambda x: -x[1]):
-        logger.info(f"  {spk}: {count} words")
+    chunk_words_by_speaker = _by_first_seen(labels, chunk_counts, chunk_first)
+    
+    logger.info(
+        "Chunk region ({}ms onwards): {} words", chunk_start, sum(chunk_words_by_speaker.values())
+    )
+    logger.opt(lazy=True).debug(
+        "  Chunk speakers: {}",
+        lambda: ", ".join(
+            f"{spk} {count} words"
+            for spk, count in sorted(chunk_words_by_speaker.items(), key=lambda x: -x[1])
+        ),
+    )
     # Determine which speaker to accept in chunk
     # Option 1: Use enrollment label (original approach, but suffers from label drift)
     # Option 2: Use majority speaker in chunk (more robust to label drift)
     if settings.USE_MAJORITY_SPEAKER and chunk_words_by_speaker:
         # Use the most common speaker in chunk region
         chunk_user_label = max(chunk_words_by_speaker.items(), key=lambda x: x[1])[0]
-        logger.info(f"  Enrollment speaker was: {user_label}")
-        logger.info(f"  Using MAJORITY speaker from chunk: {chunk_user_label}")
+        logger.info(
+            "  Using MAJORITY speaker from chunk: {} (enrollment speaker was {})",
+            chunk_user_label, user_label,
+        )
         actual_user_label = chunk_user_label
     else:
         # Use enrollment speaker label (original behavior)
-        logger.info(f"  Looking for user speaker: {user_label}")
+        logger.info("  Looking for user speaker: {}", user_label)
         actual_user_label = user_label
     
-    user_words = [
-        w for w in stt_words
-        if w["speaker"] == actual_user_label and w["start"] >= chunk_start
-    ]
-    
-    logger.info(f"  Found {len(user_words)} words from {actual_user_label} in chunk region")
-
-    # 3) Group contiguous words into segments
-    segments: List[List[Dict[str, Any]]] = []
-    cur: List[Dict[str, Any]] = []
-    last_end = None
-    for w in user_words:
-        if last_end is None or (w["start"] - last_end) <= GAP:
-            cur.append(w)
-        else:
-            segments.append(cur)
-            cur = [w]
-        last_end = w["end"]
-    if cur:
-        segments.append(cur)
-
-    # 4) Filter segments and normalize times relative to original chunk
+    # Chunk words of the chosen label, selected once the label is known
+    user_idx = np.arange(len(starts))[chunk_sel][chunk_ids == labels.index(actual_user_label)]
+    user_start_arr = starts[user_idx]
+    user_end_arr = ends[user_idx]
+    
+    logger.info("  Found {} words from {} in chunk region", len(user_start_arr), actual_user_label)
+
+    # 3) Group contiguous words into segments; segment j is words seg_lo[j]:seg_hi[j]
+    bounds = _group_segments(user_start_arr, user_end_arr, GAP)
+    seg_lo, seg_hi = bounds[:-1], bounds[1:]
+    
+    # 4) Filter segments on arrays so rejected ones never reach the Python loop.
+    # Joined text length = sum of word lengths + one space between each pair of words.
+    user_texts = texts[user_idx].tolist()
+    word_chars = np.fromiter(map(len, user_texts), dtype=np.int64, count=len(user_texts))
+    char_cum = np.concatenate(([0], np.cumsum(word_chars)))
+    seg_chars = char_cum[seg_hi] - char_cum[seg_lo] + (seg_hi - seg_lo - 1)
+    seg_starts = user_start_arr[seg_lo] - chunk_start
+    seg_ends = user_end_arr[seg_hi - 1] - chunk_start
+    keep = ((seg_ends - seg_starts) >= MIN_MS) & (seg_chars >= MIN_CHARS)
+    
+    # Normalize times relative to original chunk
+    user_confs = confs[user_idx].tolist()
     kept: List[Dict[str, Any]] = []
-    filtered_out = 0
-    
-    logger.info(f"Segment filtering (min {MIN_MS}ms, min {MIN_CHARS} chars):")
-    logger.info(f"  Found {len(segments)} raw segments before filtering")
-    
-    for i, seg in enumerate(segments):
-        seg_start = seg[0]["start"] - chunk_start
-        seg_end = seg[-1]["end"] - chunk_start
-        dur = seg_end - seg_start
-        text = " ".join(w["text"] for w in seg)
-        
-        if dur >= MIN_MS and len(text) >= MIN_CHARS:
-            avg_conf = sum(w.get("confidence", 1.0) for w in seg) / len(seg)
-            kept.append({
-                "start_ms": int(seg_start),
-                "end_ms": int(seg_end),
-                "text": text,
-                "avg_conf": float(avg_conf),
-            })
-            logger.info(f"  ✓ Segment {i+1}: {dur}ms, {len(text)} chars - \"{text[:50]}...\"")
-        else:
-            filtered_out += 1
-            logger.info(f"  ✗ Segment {i+1}: {dur}ms, {len(text)} chars - FILTERED (too short)")
-    
-    logger.info(f"  Result: {len(kept)} kept, {filtered_out} filtered out")
+    for j in np.flatnonzero(keep).tolist():
+        lo, hi = int(seg_lo[j]), int(seg_hi[j])
+        kept.append({
+            "start_ms": int(seg_starts[j]),
+            "end_ms": int(seg_ends[j]),
+            "text": " ".join(user_texts[lo:hi]),
+            "avg_conf": float(sum(user_confs[lo:hi]) / (hi - lo)),
+        })
+    filtered_out = len(seg_lo) - len(kept)
+    
+    # One aggregated line instead of a formatted line per segment
+    logger.info(
+        "Segment filtering (min {}ms, min {} chars): {} raw, {} kept, {} filtered out",
+        MIN_MS, MIN_CHARS, len(seg_lo), len(kept), filtered_out,
+    )
+    logger.opt(lazy=True).debug(
+        "  Kept segments: {}",
+        lambda: "; ".join(
+            f"{seg['end_ms'] - seg['start_ms']}ms \"{seg['text'][:50]}\"" for seg in kept
+        ),
+    )
 
     # Return the actual speaker label used (may differ from enrollment label if USE_MAJORITY_SPEAKER=True)
     return MapResult(status="ok", user_label=actual_user_label, kept=kept)
 
+
+
+def _by_first_seen(labels: List[Any], totals: np.ndarray, first_seen: np.ndarray) -> Dict[Any, int]:
+    """
+    Build {label: total} for labels seen in a region, ordered by their first word there.
+    
+    Matches the insertion order of accumulating word by word, so max() and
+    stable sorts break ties exactly as before.
+    """
+    seen = sorted(np.flatnonzero(first_seen >= 0).tolist(), key=first_seen.__getitem__)
+    return {labels[k]: int(totals[k]) for k in seen}
+
+
+def _region_selections(
+    starts: np.ndarray,
+    enroll_ms: int,
+    chunk_start: int
+) -> Tuple[Union[slice, np.ndarray], Union[slice, np.ndarray]]:
+    """
+    Select the enrollment (start < enroll_ms) and chunk (start >= chunk_start) words.
+    
+    STT words normally arrive sorted by start time, in which case both regions
+    are contiguous and their boundaries are found by binary search (slices, no
+    per-word masks). Unsorted input falls back to index arrays, still in word order.
+    """
+    if starts.shape[0] < 2 or bool(np.all(starts[1:] >= starts[:-1])):
+        enroll_end_idx = int(np.searchsorted(starts, enroll_ms, side="left"))
+        chunk_start_idx = int(np.searchsorted(starts, chunk_start, side="left"))
+        return slice(0, enroll_end_idx), slice(chunk_start_idx, starts.shape[0])
+    return np.flatnonzero(starts < enroll_ms), np.flatnonzero(starts >= chunk_start)
+
+
+def _region_stats_kernel(
+    enroll_ids: np.ndarray,
+    enroll_durations: np.ndarray,
+    chunk_ids: np.ndarray,
+    n_labels: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Single pass over each region's words computing, per label:
+    enrollment speech time, first enrollment word index (-1 if none),
+    chunk word count and first chunk word index (-1 if none).
+    """
+    label_time = np.zeros(n_labels, dtype=np.int64)
+    enroll_first = np.full(n_labels, -1, dtype=np.int64)
+    chunk_counts = np.zeros(n_labels, dtype=np.int64)
+    chunk_first = np.full(n_labels, -1, dtype=np.int64)
+    for i in range(enroll_ids.shape[0]):
+        k = enroll_ids[i]
+        label_time[k] += enroll_durations[i]
+        if enroll_first[k] < 0:
+            enroll_first[k] = i
+    for i in range(chunk_ids.shape[0]):
+        k = chunk_ids[i]
+        chunk_counts[k] += 1
+        if chunk_first[k] < 0:
+            chunk_first[k] = i
+    return label_time, enroll_first, chunk_counts, chunk_first
+
+
+def _group_segments_kernel(starts: np.ndarray, ends: np.ndarray, gap: int) -> np.ndarray:
+    """Boundaries b such that words b[j]:b[j+1] form one segment (gaps of at most gap ms)."""
+    n = starts.shape[0]
+    bounds = np.empty(n + 1, dtype=np.int64)
+    bounds[0] = 0
+    if n == 0:
+        return bounds[:1]
+    m = 1
+    for i in range(1, n):
+        if starts[i] - ends[i - 1] > gap:
+            bounds[m] = i
+            m += 1
+    bounds[m] = n
+    return bounds[:m + 1]
+
+
+def _region_stats_np(
+    enroll_ids: np.ndarray,
+    enroll_durations: np.ndarray,
+    chunk_ids: np.ndarray,
+    n_labels: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """NumPy fallback for _region_stats_kernel (bincount sums, no per-word Python loop)."""
+    label_time = np.bincount(
+        enroll_ids, weights=enroll_durations, minlength=n_labels
+    ).astype(np.int64)
+    chunk_counts = np.bincount(chunk_ids, minlength=n_labels).astype(np.int64)
+    return label_time, _first_index(enroll_ids, n_labels), chunk_counts, _first_index(chunk_ids, n_labels)
+
+
+def _first_index(ids: np.ndarray, n_labels: int) -> np.ndarray:
+    """Index of each label's first occurrence in ids (-1 if absent)."""
+    first = np.full(n_labels, -1, dtype=np.int64)
+    present, first_idx = np.unique(ids, return_index=True)
+    first[present] = first_idx
+    return first
+
+
+def _group_segments_np(starts: np.ndarray, ends: np.ndarray, gap: int) -> np.ndarray:
+    """NumPy fallback for _group_segments_kernel (vectorized gap test instead of a per-word branch)."""
+    n = starts.shape[0]
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    breaks = np.flatnonzero((starts[1:] - ends[:-1]) > gap) + 1
+    return np.concatenate(([0], breaks, [n])).astype(np.int64)
+
+
+# Compiled with Numba when installed; otherwise the vectorized NumPy fallbacks
+if NUMBA_AVAILABLE:
+    _region_stats = njit(_region_stats_kernel)
+    _group_segments = njit(_group_segments_kernel)
+else:
+    _region_stats = _region_stats_np
+    _group_segments = _group_segments_np
@@ -0,0 +1,64 @@
+"""
+In-process cache of each user's latest enrollment embedding.
+
+A device streaming chunks triggers one webhook per chunk, all matched against
+the same enrollment. Caching the decoded embedding per user skips the
+enrollment query and vector decode on repeat webhooks.
+"""
+
+from typing import Optional, Tuple
+import numpy as np
+from sqlalchemy import select, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.utils.cache import TTLCache
+
+# user_id -> (enrollment_id, embedding). The short TTL bounds staleness in other
+# worker processes, which don't see this process's invalidations.
+ENROLLMENT_CACHE_TTL_S = 300
+_embedding_cache = TTLCache(maxsize=1024, ttl=ENROLLMENT_CACHE_TTL_S)
+
+LATEST_ENROLLMENT = (
+    select(models.Enrollment.id, models.Enrollment.embedding_vector)
+    .where(models.Enrollment.user_id == bindparam("user_id"))
+    .order_by(models.Enrollment.created_at.desc())
+    .limit(1)
+)
+
+
+async def get_enrollment_embedding(
+    db: AsyncSession,
+    user_id: int
+) -> Optional[Tuple[int, Optional[np.ndarray]]]:
+    """
+    Get the user's latest enrollment ID and embedding, from cache when possible.
+    
+    Args:
+        db: Database session used on a cache miss
+        user_id: User ID (primary key)
+    
+    Returns:
+        Tuple of (enrollment_id, read-only float32 embedding or None if the
+        enrollment has no embedding), or None if the user has no enrollment
+    """
+    cached = _embedding_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    row = (await db.execute(LATEST_ENROLLMENT, {"user_id": user_id})).first()
+    if row is None:
+        return None
+    if row.embedding_vector is None:
+        # Not cached: a re-enrollment should be picked up immediately
+        return row.id, None
+    
+    embedding = np.asarray(row.embedding_vector, dtype=np.float32)
+    embedding.flags.writeable = False  # shared between concurrent webhooks
+    entry = (row.id, embedding)
+    _embedding_cache.set(user_id, entry)
+    return entry
+
+
+def invalidate_enrollment_embedding(user_id: int) -> None:
+    """Drop the cached embedding after the user's enrollment changes."""
+    _embedding_cache.pop(user_id)
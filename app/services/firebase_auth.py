@@ -1,17 +1,31 @@
 """
 Firebase Authentication service for verifying ID tokens.
+
+The Admin SDK is imported and initialized on the first verify_id_token call
+rather than at import, so startup (and dev/test runs that never
+authenticate) skip the SDK import and credential load.
 """
 
-import firebase_admin
-from firebase_admin import credentials, auth
 from loguru import logger
 from pathlib import Path
 from typing import Optional
+import hashlib
 import os
 import json
+import threading
+import time
+from app.config import get_settings
+from app.utils.cache import TTLCache
 
 
 _firebase_app = None
+_init_lock = threading.Lock()
+
+# Token digest -> decoded claims, so repeat requests with the same token skip the
+# RSA signature check. Entries never outlive the token's own `exp` (minus a margin).
+# Keyed by a 16-byte blake2b digest so the cache holds no raw bearer tokens (~1 KB each).
+TOKEN_EXPIRY_MARGIN_S = 30
+_token_cache = TTLCache(maxsize=10_000, ttl=get_settings().FIREBASE_TOKEN_CACHE_SECONDS)
 
 
 def initialize_firebase():
@@ -19,13 +33,27 @@ def initialize_firebase():
     Initialize Firebase Admin SDK.
     
     Requires FIREBASE_SERVICE_ACCOUNT_KEY environment variable pointing to
-    the service account JSON file path.
+    the service account JSON file path. Safe to call from several threads:
+    only one of them performs the initialization.
     """
-    global _firebase_app
-    
     if _firebase_app is not None:
         return _firebase_app
     
+    # Reached from request handling and from the startup warm-up thread;
+    # double-checked so the initialized fast path never takes the lock
+    with _init_lock:
+        if _firebase_app is None:
+            _load_firebase_app()
+        return _firebase_app
+
+
+def _load_firebase_app():
+    """Initialize the Admin SDK into the module-level app (caller holds the lock)."""
+    global _firebase_app
+    
+    import firebase_admin
+    from firebase_admin import credentials
+    
     # Check if already initialized
     try:
         _firebase_app = firebase_admin.get_app()
@@ -67,6 +95,55 @@ def initialize_firebase():
         return None
 
 
+def warm_firebase() -> None:
+    """
+    Initialize Firebase and prefetch Google's token signing certificates.
+    
+    Called from app startup so the first authenticated request doesn't pay for
+    the SDK/auth client setup and the certificate fetch (up to seconds on a
+    cold start). Does nothing when no Firebase credentials are configured.
+    """
+    if not (os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON') or os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')):
+        return
+    
+    started = time.perf_counter()
+    if initialize_firebase() is None:
+        return
+    
+    from firebase_admin import auth
+    
+    # A rejected dummy token still builds the auth client, its HTTP session and crypto backends
+    try:
+        auth.verify_id_token("warmup")
+    except Exception:
+        pass
+    
+    # Fill the verifier's cached HTTP session with the signing certs (private API, best effort)
+    try:
+        verifier = auth._get_client(_firebase_app)._token_verifier
+        verifier.request(verifier.id_token_verifier.cert_url, method="GET")
+    except Exception as e:
+        logger.debug("Firebase certificate prefetch skipped: {}", e)
+    
+    logger.info("Firebase auth warmed up in {:.0f}ms", (time.perf_counter() - started) * 1000)
+
+
+def _token_key(id_token: str) -> bytes:
+    return hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+
+
+def cached_token_claims(id_token: str) -> Optional[dict]:
+    """
+    Return the decoded claims of an already verified, unexpired token, or None.
+    
+    Never blocks, so async callers can check it on the event loop and only
+    move a full verify_id_token call to a worker thread on a miss.
+    """
+    if not id_token:
+        return None
+    return _token_cache.get(_token_key(id_token))
+
+
 def verify_id_token(id_token: str) -> Optional[dict]:
     """
     Verify a Firebase ID token and return the decoded token.
@@ -75,9 +152,18 @@ def verify_id_token(id_token: str) -> Optional[dict]:
         id_token: Firebase ID token from client
     
     Returns:
-        Decoded token with user info (uid, email, etc.) or None if invalid
+        Decoded token with user info (uid, email, etc.) or None if invalid.
+        Cached results are shared between callers and must not be mutated.
     """
-    if not _firebase_app:
+    if not id_token:
+        return None
+    
+    token_key = _token_key(id_token)
+    decoded_token = _token_cache.get(token_key)
+    if decoded_token is not None:
+        return decoded_token
+    
+    if _firebase_app is None:
         initialize_firebase()
     
     if not _firebase_app:
@@ -85,10 +171,11 @@ def verify_id_token(id_token: str) -> Optional[dict]:
         logger.warning("Firebase not initialized - skipping token verification")
         return None
     
+    from firebase_admin import auth
+    
     try:
         decoded_token = auth.verify_id_token(id_token)
-        logger.debug(f"Token verified for user: {decoded_token.get('uid')}")
-        return decoded_token
+        logger.debug("Token verified for user: {}", decoded_token.get('uid'))
     except auth.InvalidIdTokenError as e:
         logger.warning(f"Invalid ID token: {e}")
         return None
@@ -98,12 +185,8 @@ def verify_id_token(id_token: str) -> Optional[dict]:
     except Exception as e:
         logger.error(f"Error verifying ID token: {e}")
         return None
-
-
-# Initialize on module import (safe to fail in development)
-try:
-    initialize_firebase()
-except Exception as e:
-    logger.error(f"Firebase initialization failed on import: {e}")
-    _firebase_app = None
-
+    
+    ttl = min(_token_cache.ttl, decoded_token.get('exp', 0) - time.time() - TOKEN_EXPIRY_MARGIN_S)
+    if ttl > 0:
+        _token_cache.set(token_key, decoded_token, ttl=ttl)
+    return decoded_token
@@ -0,0 +1,131 @@
+"""
+On-disk reverse-geocode cache that survives process restarts.
+
+A small SQLite file under STORAGE_ROOT maps rounded coordinates to addresses,
+so a restarted worker doesn't re-query Nominatim for places it has already
+resolved (its usage policy asks clients to cache results). All functions are
+blocking; async callers should run them via run_in_threadpool. Disk errors
+are logged and treated as cache misses.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+from loguru import logger
+from app.config import get_settings
+
+GEOCODE_DB_FILENAME = "geocode_cache.sqlite"
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _ttl_s() -> int:
+    return get_settings().GEOCODE_CACHE_TTL_DAYS * 24 * 60 * 60
+
+
+def enabled() -> bool:
+    """Whether the disk cache is on (GEOCODE_CACHE_TTL_DAYS > 0)."""
+    return get_settings().GEOCODE_CACHE_TTL_DAYS > 0
+
+
+def _quantize(key: Tuple[float, float], precision: int) -> Tuple[int, int]:
+    """Integer form of a rounded (lat, lon) key, so lookups never compare floats."""
+    scale = 10 ** precision
+    return round(key[0] * scale), round(key[1] * scale)
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Open the cache database on first use. Call with _lock held."""
+    global _connection
+    if _connection is None:
+        path = Path(get_settings().STORAGE_ROOT) / GEOCODE_DB_FILENAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL + NORMAL: writes are an append to the log, without an fsync per insert
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS geo ("
+            "qlat INTEGER NOT NULL, qlon INTEGER NOT NULL, addr TEXT NOT NULL, ts INTEGER NOT NULL, "
+            "PRIMARY KEY (qlat, qlon))"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS geo_ts ON geo (ts)")
+        _connection = connection
+    return _connection
+
+
+def load_recent(precision: int, limit: int) -> List[Tuple[Tuple[float, float], str, float]]:
+    """
+    Return the most recently stored addresses that are still within the TTL.
+    
+    Args:
+        precision: Decimal places of the in-memory keys
+        limit: Maximum number of rows
+    
+    Returns:
+        List of ((lat, lon), address, remaining TTL in seconds), newest first
+    """
+    now = int(time.time())
+    ttl = _ttl_s()
+    scale = 10 ** precision
+    try:
+        with _lock:
+            rows = _get_connection().execute(
+                "SELECT qlat, qlon, addr, ts FROM geo WHERE ts > ? ORDER BY ts DESC LIMIT ?",
+                (now - ttl, limit),
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Geocode disk cache unavailable: {e}")
+        return []
+    return [
+        ((round(qlat / scale, precision), round(qlon / scale, precision)), addr, ts + ttl - now)
+        for qlat, qlon, addr, ts in rows
+    ]
+
+
+def get(key: Tuple[float, float], precision: int) -> Optional[Tuple[str, float]]:
+    """
+    Look up a stored address.
+    
+    Returns:
+        (address, remaining TTL in seconds), or None if missing or expired
+    """
+    now = int(time.time())
+    ttl = _ttl_s()
+    try:
+        with _lock:
+            row = _get_connection().execute(
+                "SELECT addr, ts FROM geo WHERE qlat = ? AND qlon = ? AND ts > ?",
+                (*_quantize(key, precision), now - ttl),
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Geocode disk cache read failed: {e}")
+        return None
+    if row is None:
+        return None
+    address, ts = row
+    return address, ts + ttl - now
+
+
+def put(key: Tuple[float, float], precision: int, address: str) -> None:
+    """Store (or refresh) the address for a rounded coordinate key."""
+    try:
+        with _lock:
+            _get_connection().execute(
+                "INSERT OR REPLACE INTO geo (qlat, qlon, addr, ts) VALUES (?, ?, ?, ?)",
+                (*_quantize(key, precision), address, int(time.time())),
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Geocode disk cache write failed: {e}")
+
+
+def close() -> None:
+    """Close the database connection (called on app shutdown)."""
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
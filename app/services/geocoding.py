@@ -4,12 +4,167 @@ Geocoding service for reverse geocoding GPS coordinates to addresses.
 Uses OpenStreetMap Nominatim for free geocoding (no API key required).
 """
 
-from typing import Optional, Tuple
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
 import httpx
+import orjson
+from fastapi.concurrency import run_in_threadpool
 from loguru import logger
+from app.config import get_settings
+from app.services import geocode_store
+from app.utils.cache import TTLCache
+
+# 4 decimal places is ~11m: the same home/office resolves to one key
+GEOCODE_PRECISION = 4
+GEOCODE_CACHE_TTL_S = 24 * 60 * 60
+# Failed/empty lookups are remembered briefly so dead spots aren't retried per chunk
+GEOCODE_NEGATIVE_TTL_S = 15 * 60
+# Addresses copied from the disk cache into memory at startup
+GEOCODE_PRELOAD_ROWS = 10_000
+
+_address_cache = TTLCache(maxsize=10_000, ttl=GEOCODE_CACHE_TTL_S)
+_MISS = object()
+# Lookups currently being fetched; concurrent callers for the same key await the leader's future
+_inflight: Dict[Tuple[float, float], "asyncio.Future[Optional[str]]"] = {}
+
+# One pooled client per process so lookups reuse the keep-alive TCP/TLS connection
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared Nominatim HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url="https://nominatim.openstreetmap.org",
+            timeout=5.0,
+            headers={"User-Agent": "SelectiveSpeaker/1.0"},  # Required by Nominatim usage policy
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+        )
+    return _http_client
+
+
+async def close_client() -> None:
+    """Close the shared HTTP client (called on app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Process-wide spacing of Nominatim requests (usage policy: at most 1 req/s)
+_rate_lock = asyncio.Lock()
+_next_request_at = 0.0
+
+
+async def _wait_for_request_slot() -> None:
+    """Sleep until NOMINATIM_MIN_INTERVAL_S has passed since the previous request."""
+    global _next_request_at
+    async with _rate_lock:
+        delay = _next_request_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        _next_request_at = time.monotonic() + get_settings().NOMINATIM_MIN_INTERVAL_S
+
+
+def preload_cache() -> int:
+    """
+    Fill the in-memory cache with the most recent addresses from the disk cache.
+    
+    Blocking; called once at startup via run_in_threadpool.
+    
+    Returns:
+        Number of addresses loaded
+    """
+    if not geocode_store.enabled():
+        return 0
+    rows = geocode_store.load_recent(GEOCODE_PRECISION, GEOCODE_PRELOAD_ROWS)
+    # Newest first: insert oldest first so LRU eviction drops the oldest
+    for key, address, remaining_s in reversed(rows):
+        _address_cache.set(key, address, ttl=min(GEOCODE_CACHE_TTL_S, remaining_s))
+    return len(rows)
+
+
+def geocode_key(lat: float, lon: float) -> Tuple[float, float]:
+    """Round coordinates into the key shared by nearby GPS fixes."""
+    return round(lat, GEOCODE_PRECISION), round(lon, GEOCODE_PRECISION)
 
 
 async def reverse_geocode(lat: float, lon: float) -> Optional[str]:
+    """
+    Reverse geocode GPS coordinates, reusing recent results for nearby points.
+    
+    Coordinates are rounded by geocode_key() so repeat chunks from the same
+    place skip the Nominatim round-trip. Failed lookups are cached too, for
+    GEOCODE_NEGATIVE_TTL_S only. Addresses are also kept in the on-disk
+    geocode_store for GEOCODE_CACHE_TTL_DAYS, which is checked before the
+    network. Concurrent misses for the same key share a single lookup: the
+    first caller fetches (and takes the rate-limit slot), the others await
+    its result. If that first caller is cancelled, the others retry on their own.
+    
+    Args:
+        lat: Latitude
+        lon: Longitude
+    
+    Returns:
+        Formatted address string or None if geocoding fails
+    """
+    key = geocode_key(lat, lon)
+    address = _address_cache.get(key, _MISS)
+    if address is not _MISS:
+        logger.debug("Geocode cache hit for {}", key)
+        return address
+    
+    pending = _inflight.get(key)
+    if pending is not None:
+        logger.debug("Joining in-flight geocode for {}", key)
+        try:
+            # shield: a cancelled follower must not cancel the leader's lookup
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise  # this caller was cancelled
+            # The leading caller was cancelled, not us: look it up ourselves
+            # (the first follower to get here becomes the new leader)
+            return await reverse_geocode(lat, lon)
+    
+    future: "asyncio.Future[Optional[str]]" = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        address = await _lookup_address(key, lat, lon)
+        future.set_result(address)
+        return address
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved so an unawaited future doesn't log a warning
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _lookup_address(key: Tuple[float, float], lat: float, lon: float) -> Optional[str]:
+    """Resolve a memory-cache miss from the disk cache, then Nominatim, caching the result."""
+    use_disk = geocode_store.enabled()
+    if use_disk:
+        stored = await run_in_threadpool(geocode_store.get, key, GEOCODE_PRECISION)
+        if stored is not None:
+            address, remaining_s = stored
+            logger.debug("Geocode disk cache hit for {}", key)
+            _address_cache.set(key, address, ttl=min(GEOCODE_CACHE_TTL_S, remaining_s))
+            return address
+    
+    address = await _fetch_address(lat, lon)
+    _address_cache.set(key, address, ttl=None if address else GEOCODE_NEGATIVE_TTL_S)
+    if address and use_disk:
+        await run_in_threadpool(geocode_store.put, key, GEOCODE_PRECISION, address)
+    return address
+
+
+async def _fetch_address(lat: float, lon: float) -> Optional[str]:
     """
     Convert GPS coordinates to a human-readable address using OpenStreetMap Nominatim.
     
@@ -24,89 +179,45 @@ async def reverse_geocode(lat: float, lon: float) -> Optional[str]:
         Formatted address string or None if geocoding fails
     """
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(
-                "https://nominatim.openstreetmap.org/reverse",
-                params={
-                    "lat": lat,
-                    "lon": lon,
-                    "format": "json",
-                    "zoom": 18,  # Street-level detail
-                },
-                headers={
-                    "User-Agent": "SelectiveSpeaker/1.0"  # Required by Nominatim usage policy
-                }
-            )
+        await _wait_for_request_slot()
+        response = await _get_client().get(
+            "/reverse",
+            params={
+                "lat": lat,
+                "lon": lon,
+                "format": "json",
+                "zoom": 18,  # Street-level detail
+                # Only the structured address is used; skip the optional response blocks
+                "addressdetails": 1,
+                "namedetails": 0,
+                "extratags": 0,
+                "polygon_geojson": 0,
+            },
+        )
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.debug("Geocoding response for ({}, {}): {}", lat, lon, data)
+            
+            # Try to get structured address for better formatting
+            address = _address_from_parts(data.get("address", {}))
+            if address:
+                logger.info(f"Geocoded ({lat}, {lon}) -> {address}")
+                return address
+            
+            # Fallback to display_name if structured data not available
+            display_name = data.get("display_name")
+            if display_name:
+                address = _address_from_display_name(display_name)
+                logger.info(f"Geocoded ({lat}, {lon}) -> {address} (from display_name)")
+                return address
+            
+            logger.warning(f"No address found for ({lat}, {lon}): {data}")
+            return None
+        else:
+            logger.warning(f"Geocoding failed with status {response.status_code}")
+            return None
             
-            if response.status_code == 200:
-                data = response.json()
-                logger.debug(f"Geocoding response for ({lat}, {lon}): {data}")
-                
-                # Try to get structured address for better formatting
-                address_data = data.get("address", {})
-                
-                # Build a clean address from structured data
-                parts = []
-                
-                # Add house number and road together (no comma between them)
-                house_number = address_data.get("house_number", "")
-                road = address_data.get("road", "")
-                if house_number and road:
-                    parts.append(f"{house_number} {road}")
-                elif road:
-                    parts.append(road)
-                
-                # Add neighborhood or suburb if available
-                neighborhood = address_data.get("neighbourhood") or address_data.get("suburb")
-                if neighborhood:
-                    parts.append(neighborhood)
-                
-                # Add city
-                city = address_data.get("city") or address_data.get("town") or address_data.get("village")
-                if city:
-                    parts.append(city)
-                
-                # Add state/province
-                state = address_data.get("state")
-                if state:
-                    parts.append(state)
-                
-                # If we built a clean address from structured data, use it
-                if parts:
-                    address = ", ".join(parts[:3])  # Limit to 3 parts for brevity
-                    logger.info(f"Geocoded ({lat}, {lon}) -> {address}")
-                    return address
-                
-                # Fallback to display_name if structured data not available
-                display_name = data.get("display_name")
-                if display_name:
-                    # Clean up the display name
-                    address_parts = display_name.split(", ")
-                    
-                    # Try to merge house number with street if they're separate
-                    cleaned_parts = []
-                    i = 0
-                    while i < len(address_parts):
-                        part = address_parts[i].strip()
-                        
-                        # If this looks like a house number and next part exists, combine them
-                        if i + 1 < len(address_parts) and part.isdigit():
-                            cleaned_parts.append(f"{part} {address_parts[i + 1].strip()}")
-                            i += 2
-                        else:
-                            cleaned_parts.append(part)
-                            i += 1
-                    
-                    address = ", ".join(cleaned_parts[:3])
-                    logger.info(f"Geocoded ({lat}, {lon}) -> {address} (from display_name)")
-                    return address
-                
-                logger.warning(f"No address found for ({lat}, {lon}): {data}")
-                return None
-            else:
-                logger.warning(f"Geocoding failed with status {response.status_code}")
-                return None
-                
     except httpx.TimeoutException:
         logger.warning(f"Geocoding timeout for ({lat}, {lon})")
         return None
@@ -114,3 +225,44 @@ async def reverse_geocode(lat: float, lon: float) -> Optional[str]:
         logger.error(f"Geocoding error for ({lat}, {lon}): {e}")
         return None
 
+
+# Structured address fields, in output order; the first non-empty key of each group wins
+_NEIGHBORHOOD_KEYS = ("neighbourhood", "suburb")
+_CITY_KEYS = ("city", "town", "village")
+_STATE_KEYS = ("state",)
+_MAX_ADDRESS_PARTS = 3  # Limit to 3 parts for brevity
+
+
+def _address_from_parts(address_data: Dict[str, str]) -> Optional[str]:
+    """
+    Build "house road, neighborhood, city" style text from Nominatim's structured address.
+    
+    Returns:
+        Up to _MAX_ADDRESS_PARTS comma-separated parts, or None if none are present
+    """
+    # House number and road together (no comma between them); a number alone is dropped
+    road = address_data.get("road")
+    house_number = address_data.get("house_number")
+    street = f"{house_number} {road}" if road and house_number else road
+    
+    parts = [street] if street else []
+    for keys in (_NEIGHBORHOOD_KEYS, _CITY_KEYS, _STATE_KEYS):
+        value = next((address_data[key] for key in keys if address_data.get(key)), None)
+        if value:
+            parts.append(value)
+    return ", ".join(parts[:_MAX_ADDRESS_PARTS]) if parts else None
+
+
+def _address_from_display_name(display_name: str) -> str:
+    """Shorten display_name to its first parts, merging a bare house number with the street after it."""
+    parts = iter(part.strip() for part in display_name.split(", "))
+    cleaned_parts = []
+    for part in parts:
+        if part.isdigit():
+            street = next(parts, None)
+            if street is not None:
+                part = f"{part} {street}"
+        cleaned_parts.append(part)
+        if len(cleaned_parts) == _MAX_ADDRESS_PARTS:
+            break
+    return ", ".join(cleaned_parts)
@@ -4,67 +4,149 @@ Speaker verification using embeddings.
 This is the CORRECT approach - compare acoustic fingerprints, not arbitrary labels.
 """
 
+import contextlib
+import math
+import threading
+from operator import itemgetter
 import torch
 import torchaudio
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import numpy as np
 from loguru import logger
 
-# Lazy load the inference pipeline to avoid startup overhead
+# Process-wide inference pipeline, loaded once (at startup when preloading is enabled)
 _inference_pipeline = None
+_inference_pipeline_lock = threading.Lock()
+
+# (start, end) of a diarized word dict
+_WORD_SPAN = itemgetter("start", "end")
 
 
 def get_inference_pipeline():
-    """Lazy load the speaker embedding inference pipeline."""
+    """Return the shared speaker embedding inference pipeline, loading it on first use."""
+    if _inference_pipeline is None:
+        # Webhooks run inference in the threadpool; only one of them may load the model
+        with _inference_pipeline_lock:
+            if _inference_pipeline is None:
+                _load_inference_pipeline()
+    return _inference_pipeline
+
+
+def warm_inference_pipeline() -> None:
+    """
+    Load the inference pipeline and run one forward pass on silence.
+    
+    Called from app startup so neither the model download/load nor the first
+    (allocation-heavy) forward pass lands on a webhook request.
+    """
+    from app.config import get_settings
+    
+    inference = get_inference_pipeline()
+    sample_rate = get_settings().AUDIO_SAMPLE_RATE
+    try:
+        with _inference_context(inference):
+            inference({"waveform": torch.zeros(1, 3 * sample_rate), "sample_rate": sample_rate})
+    except Exception as e:
+        logger.warning(f"Warm-up inference failed (model is loaded): {e}")
+    logger.info("Speaker embedding inference pipeline warmed up")
+
+
+def _load_inference_pipeline() -> None:
+    """Load pyannote/embedding into the module-level pipeline (caller holds the lock)."""
     global _inference_pipeline
     
-    if _inference_pipeline is None:
-        from app.config import settings
-        
-        logger.info("Loading speaker embedding inference pipeline (pyannote/embedding)...")
-        
-        # Require HuggingFace token
-        if not settings.HUGGINGFACE_TOKEN:
-            raise ValueError(
-                "HUGGINGFACE_TOKEN not set. Please:\n"
-                "1. Visit https://hf.co/pyannote/embedding and accept terms\n"
-                "2. Create token at https://hf.co/settings/tokens\n"
-                "3. Add HUGGINGFACE_TOKEN=your_token to .env"
-            )
-        
-        # Login to HuggingFace hub first
-        from huggingface_hub import login
-        try:
-            login(token=settings.HUGGINGFACE_TOKEN)
-            logger.info("HuggingFace login successful")
-        except Exception as e:
-            logger.error(f"HuggingFace login failed: {e}")
-            raise
+    from app.config import get_settings
+    settings = get_settings()
+    
+    logger.info("Loading speaker embedding inference pipeline (pyannote/embedding)...")
+    
+    # Require HuggingFace token
+    if not settings.HUGGINGFACE_TOKEN:
+        raise ValueError(
+            "HUGGINGFACE_TOKEN not set. Please:\n"
+            "1. Visit https://hf.co/pyannote/embedding and accept terms\n"
+            "2. Create token at https://hf.co/settings/tokens\n"
+            "3. Add HUGGINGFACE_TOKEN=your_token to .env"
+        )
+    
+    # Login to HuggingFace hub first
+    from huggingface_hub import login
+    try:
+        login(token=settings.HUGGINGFACE_TOKEN)
+        logger.info("HuggingFace login successful")
+    except Exception as e:
+        logger.error(f"HuggingFace login failed: {e}")
+        raise
+    
+    # Load model first, then create Inference
+    from pyannote.audio import Inference, Model
+    
+    if settings.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(settings.TORCH_NUM_THREADS)
+    
+    try:
+        logger.info("Loading pyannote/embedding model...")
+        # CPU unless a GPU is requested/available (Railway doesn't have GPU)
+        device = _select_device(settings.EMBEDDING_DEVICE)
+        if device.type == "cuda":
+            torch.backends.cudnn.benchmark = True  # fixed window size -> autotune conv kernels once
         
-        # Load model first, then create Inference
-        from pyannote.audio import Inference, Model
-        import torch
+        # Load the model first
+        model = Model.from_pretrained("pyannote/embedding")
+        logger.info(f"Model loaded: {type(model)}")
         
-        try:
-            logger.info("Loading pyannote/embedding model...")
-            # Explicitly specify CPU device (Railway doesn't have GPU)
-            device = torch.device("cpu")
-            
-            # Load the model first
-            model = Model.from_pretrained("pyannote/embedding")
-            logger.info(f"Model loaded: {type(model)}")
-            
-            # Create Inference from the loaded model
-            _inference_pipeline = Inference(model, device=device)
-            logger.info(f"Inference object created: {type(_inference_pipeline)} on device {device}")
-        except Exception as e:
-            logger.error(f"Failed to create Inference object: {e}", exc_info=True)
-            raise
+        if settings.QUANTIZE_EMBEDDING_MODEL:
+            if device.type == "cpu":
+                model = _quantize_model(model)
+            else:
+                logger.warning("QUANTIZE_EMBEDDING_MODEL only applies on CPU; ignored on {}", device)
         
-        logger.info("Speaker embedding inference pipeline loaded successfully")
+        # Create Inference from the loaded model
+        _inference_pipeline = Inference(model, device=device)
+        logger.info(f"Inference object created: {type(_inference_pipeline)} on device {device}")
+    except Exception as e:
+        logger.error(f"Failed to create Inference object: {e}", exc_info=True)
+        raise
     
-    return _inference_pipeline
+    logger.info("Speaker embedding inference pipeline loaded successfully")
+
+
+def _select_device(name: str) -> torch.device:
+    """Resolve EMBEDDING_DEVICE ("auto" = CUDA when available, else CPU)."""
+    if name == "auto":
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return torch.device(name)
+
+
+def _inference_context(inference) -> contextlib.ExitStack:
+    """
+    Context for embedding forward passes: no autograd tracking, plus float16
+    autocast when the pipeline runs on CUDA and EMBEDDING_FP16 is enabled.
+    """
+    from app.config import get_settings
+    
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    device = getattr(inference, "device", None)
+    if device is not None and device.type == "cuda" and get_settings().EMBEDDING_FP16:
+        stack.enter_context(torch.autocast(device_type="cuda", dtype=torch.float16))
+    return stack
+
+
+def _quantize_model(model):
+    """
+    Apply int8 dynamic quantization to the model's Linear/LSTM layers for CPU inference.
+    
+    Weights are stored as int8 and activations quantized on the fly, which
+    roughly halves the cost of those layers. Convolutions stay in float32.
+    """
+    model.eval()
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+    )
+    logger.info("Applied int8 dynamic quantization to speaker embedding model")
+    return quantized
 
 
 def extract_embedding(audio_path: Path) -> np.ndarray:
@@ -86,7 +168,8 @@ def extract_embedding(audio_path: Path) -> np.ndarray:
     import torch
     
     try:
-        waveform, sample_rate = sf.read(str(audio_path))
+        # float32 straight from the decoder: no float64 copy to downcast afterwards
+        waveform, sample_rate = sf.read(str(audio_path), dtype="float32")
         logger.info(f"Soundfile loaded audio successfully: {waveform.shape}, sr={sample_rate}")
     except Exception as e:
         logger.error(f"Failed to load audio with soundfile: {e}")
@@ -116,35 +199,41 @@ def extract_embedding(audio_path: Path) -> np.ndarray:
     
     # Use pyannote Inference API with preloaded audio
     # Returns temporal embeddings (one per sliding window)
-    try:
-        temporal_embeddings = inference(audio_dict)
-    except Exception as e:
-        logger.error(f"Inference failed with audio dict: {e}")
-        logger.info("Trying alternative: passing file path directly")
-        # Fallback to file path if dict doesn't work
-        temporal_embeddings = inference(str(audio_path))
+    with _inference_context(inference):
+        try:
+            temporal_embeddings = inference(audio_dict)
+        except Exception as e:
+            logger.error(f"Inference failed with audio dict: {e}")
+            logger.info("Trying alternative: passing file path directly")
+            # Fallback to file path if dict doesn't work
+            temporal_embeddings = inference(str(audio_path))
     
-    # Convert to numpy
-    embeddings_array = np.array(temporal_embeddings)
-    logger.debug(f"Temporal embeddings shape: {embeddings_array.shape}")
+    # Convert to numpy (float32 even if the forward pass ran in fp16)
+    embeddings_array = np.array(temporal_embeddings, dtype=np.float32)
+    logger.debug("Temporal embeddings shape: {}", embeddings_array.shape)
     
     # Average across time dimension to get single embedding
     if embeddings_array.ndim == 2:
         # Shape is (num_windows, embedding_dim) - average across windows
         embedding_np = np.mean(embeddings_array, axis=0)
-        logger.debug(f"Averaged {embeddings_array.shape[0]} temporal windows")
+        logger.debug("Averaged {} temporal windows", embeddings_array.shape[0])
     else:
         # Already single embedding
         embedding_np = embeddings_array.squeeze()
     
-    logger.debug(f"Before normalization - first 5 values: {embedding_np[:5]}")
-    logger.debug(f"Before normalization - norm: {np.linalg.norm(embedding_np):.6f}")
+    logger.opt(lazy=True).debug(
+        "Before normalization - first 5 values: {}, norm: {:.6f}",
+        lambda: embedding_np[:5], lambda: float(np.linalg.norm(embedding_np)),
+    )
     
     # Normalize
-    embedding_np = embedding_np / np.linalg.norm(embedding_np)
+    embedding_np = _normalize(embedding_np)
     
-    logger.debug(f"After normalization - first 5 values: {embedding_np[:5]}")
-    logger.info(f"Extracted embedding: shape={embedding_np.shape}, mean={np.mean(embedding_np):.4f}, std={np.std(embedding_np):.4f}")
+    logger.opt(lazy=True).debug("After normalization - first 5 values: {}", lambda: embedding_np[:5])
+    logger.opt(lazy=True).info(
+        "Extracted embedding: shape={}, mean={:.4f}, std={:.4f}",
+        lambda: embedding_np.shape, lambda: float(np.mean(embedding_np)), lambda: float(np.std(embedding_np)),
+    )
     
     return embedding_np
 
@@ -165,23 +254,49 @@ def extract_embedding_from_segment(audio_path: Path, start_ms: int, end_ms: int,
     
     logger.info(f"Extracting embedding for speaker {speaker_label} from {audio_path} [{start_ms}ms-{end_ms}ms]")
     
-    # Load audio manually and crop to segment
+    # Load audio manually, decoding only the segment's frames
     import soundfile as sf
-    import torch
     
-    # Load full audio
-    waveform, sample_rate = sf.read(str(audio_path))
+    with sf.SoundFile(str(audio_path)) as audio_file:
+        sample_rate = audio_file.samplerate
+        start_sample, end_sample = _sample_range(start_ms, end_ms, sample_rate)
+        audio_file.seek(min(start_sample, audio_file.frames))
+        segment_waveform = audio_file.read(max(0, end_sample - start_sample), dtype="float32")
     
     # Convert to mono if needed
-    if waveform.ndim > 1:
-        waveform = waveform[:, 0]
+    if segment_waveform.ndim > 1:
+        segment_waveform = segment_waveform[:, 0]
     
+    return _embed_waveform(inference, segment_waveform, sample_rate, speaker_label)
+
+
+def _sample_range(start_ms: int, end_ms: int, sample_rate: int) -> Tuple[int, int]:
+    """Sample indices [start, end) of a millisecond range."""
+    return int(start_ms * sample_rate / 1000), int(end_ms * sample_rate / 1000)
+
+
+def _embed_crop(
+    inference,
+    waveform: np.ndarray,
+    sample_rate: int,
+    start_ms: int,
+    end_ms: int,
+    speaker_label: str
+) -> np.ndarray:
+    """Embed waveform[start_ms:end_ms] (mono, already loaded) through Inference.__call__."""
     # Crop to segment
-    start_sample = int(start_ms * sample_rate / 1000)
-    end_sample = int(end_ms * sample_rate / 1000)
-    segment_waveform = waveform[start_sample:end_sample]
-    
-    # Convert to torch tensor
+    start_sample, end_sample = _sample_range(start_ms, end_ms, sample_rate)
+    return _embed_waveform(inference, waveform[start_sample:end_sample], sample_rate, speaker_label)
+
+
+def _embed_waveform(
+    inference,
+    segment_waveform: np.ndarray,
+    sample_rate: int,
+    speaker_label: str
+) -> np.ndarray:
+    """Embed one mono segment through Inference.__call__ (window average, unit norm)."""
+    # Convert to torch tensor (shares memory with a float32 segment)
     waveform_tensor = torch.from_numpy(segment_waveform).unsqueeze(0).float()
     
     # Create audio dict
@@ -191,26 +306,31 @@ def extract_embedding_from_segment(audio_path: Path, start_ms: int, end_ms: int,
     }
     
     # Extract embedding for this specific segment (returns temporal embeddings)
-    temporal_embeddings = inference(audio_dict)
+    with _inference_context(inference):
+        temporal_embeddings = inference(audio_dict)
     
-    # Convert to numpy
-    embeddings_array = np.array(temporal_embeddings)
-    logger.debug(f"  Speaker {speaker_label} temporal shape: {embeddings_array.shape}")
+    # Convert to numpy (float32 even if the forward pass ran in fp16)
+    embeddings_array = np.array(temporal_embeddings, dtype=np.float32)
+    logger.debug("  Speaker {} temporal shape: {}", speaker_label, embeddings_array.shape)
     
     # Average across time dimension to get single embedding
     if embeddings_array.ndim == 2:
         # Shape is (num_windows, embedding_dim) - average across windows
         embedding_np = np.mean(embeddings_array, axis=0)
-        logger.debug(f"  Speaker {speaker_label} averaged {embeddings_array.shape[0]} windows")
+        logger.debug("  Speaker {} averaged {} windows", speaker_label, embeddings_array.shape[0])
     else:
         # Already single embedding
         embedding_np = embeddings_array.squeeze()
     
-    logger.debug(f"  Speaker {speaker_label} before norm - first 5: {embedding_np[:5]}")
-    logger.debug(f"  Speaker {speaker_label} before norm - norm: {np.linalg.norm(embedding_np):.6f}")
+    logger.opt(lazy=True).debug(
+        "  Speaker {} before norm - first 5: {}, norm: {:.6f}",
+        lambda: speaker_label, lambda: embedding_np[:5], lambda: float(np.linalg.norm(embedding_np)),
+    )
     
-    embedding_np = embedding_np / np.linalg.norm(embedding_np)
-    logger.debug(f"  Speaker {speaker_label} after norm - first 5: {embedding_np[:5]}")
+    embedding_np = _normalize(embedding_np)
+    logger.opt(lazy=True).debug(
+        "  Speaker {} after norm - first 5: {}", lambda: speaker_label, lambda: embedding_np[:5]
+    )
     
     return embedding_np
 
@@ -226,13 +346,56 @@ def cosine_similarity(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
     Returns:
         Similarity score between -1 and 1 (higher = more similar)
     """
-    # Both should already be normalized, but ensure it
-    emb1_norm = embedding1 / np.linalg.norm(embedding1)
-    emb2_norm = embedding2 / np.linalg.norm(embedding2)
+    # Both should already be normalized, but ensure it (three dot products, no temporaries)
+    norms = math.sqrt(float(embedding1 @ embedding1) * float(embedding2 @ embedding2))
+    if norms == 0.0:
+        return math.nan  # an all-zero embedding has no direction (as NumPy's 0/0 gave)
+    return float(embedding1 @ embedding2) / norms
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    """
+    Scale a freshly computed embedding to unit length in place and return it.
     
-    similarity = np.dot(emb1_norm, emb2_norm)
+    An all-zero embedding (e.g. from silent or fully masked audio) is returned
+    unchanged; it then scores 0 against every other embedding.
+    """
+    norm = math.sqrt(float(embedding @ embedding))
+    if norm == 0.0:
+        logger.warning("All-zero speaker embedding; leaving it unnormalized")
+        return embedding
+    embedding *= 1.0 / norm
+    return embedding
+
+
+def _longest_continuous_run(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    max_gap_ms: int = 1000
+) -> Tuple[int, int]:
+    """
+    Find the longest run of words separated by gaps shorter than max_gap_ms.
     
-    return float(similarity)
+    A run spans from its first word's start to its last word's end. As in the
+    original loop, the first word alone is the initial candidate and ties keep
+    the earliest candidate (np.argmax returns the first maximum).
+    
+    Args:
+        starts: Word start times in ms, in transcript order
+        ends: Word end times in ms, in transcript order
+        max_gap_ms: Gap (from previous word's end) that starts a new run
+    
+    Returns:
+        (start_ms, end_ms) of the longest run
+    """
+    breaks = np.flatnonzero(starts[1:] - ends[:-1] >= max_gap_ms) + 1
+    run_first = np.concatenate(([0], breaks))
+    run_last = np.concatenate((breaks, [len(starts)])) - 1
+    
+    candidate_starts = np.concatenate((starts[:1], starts[run_first]))
+    candidate_ends = np.concatenate((ends[:1], ends[run_last]))
+    best = int(np.argmax(candidate_ends - candidate_starts))
+    return int(candidate_starts[best]), int(candidate_ends[best])
 
 
 def extract_embeddings_per_speaker(
@@ -259,56 +422,121 @@ def extract_embeddings_per_speaker(
     speaker_segments: Dict[str, list] = {}
     
     for word in words_with_speakers:
-        speaker = word.get("speaker")
-        if speaker not in speaker_segments:
-            speaker_segments[speaker] = []
-        speaker_segments[speaker].append(word)
+        speaker_segments.setdefault(word.get("speaker"), []).append(word)
     
     # For each speaker, find longest continuous segment
-    speaker_embeddings = {}
+    longest_segments: Dict[str, Tuple[int, int]] = {}
     
     for speaker, words in speaker_segments.items():
         if not words:
             continue
         
-        # Find longest continuous segment (words close together)
-        current_segment_start = words[0]["start"]
-        current_segment_end = words[0]["end"]
-        longest_segment = (current_segment_start, current_segment_end)
-        longest_duration = current_segment_end - current_segment_start
+        # (start, end) per word as an (N, 2) array, fetched with one itemgetter call each
+        spans = np.array(list(map(_WORD_SPAN, words)), dtype=np.int64)
+        longest_segment = _longest_continuous_run(spans[:, 0], spans[:, 1])
+        longest_duration = longest_segment[1] - longest_segment[0]
         
-        for i in range(1, len(words)):
-            gap = words[i]["start"] - current_segment_end
-            
-            if gap < 1000:  # Less than 1 second gap
-                current_segment_end = words[i]["end"]
-            else:
-                # Check if current segment is longest
-                duration = current_segment_end - current_segment_start
-                if duration > longest_duration:
-                    longest_segment = (current_segment_start, current_segment_end)
-                    longest_duration = duration
-                
-                # Start new segment
-                current_segment_start = words[i]["start"]
-                current_segment_end = words[i]["end"]
-        
-        # Check final segment
-        duration = current_segment_end - current_segment_start
-        if duration > longest_duration:
-            longest_segment = (current_segment_start, current_segment_end)
-            longest_duration = duration
-        
-        # Extract embedding from longest segment if long enough
+        # Embed the longest segment if long enough (all speakers in one batch below)
         if longest_duration >= min_duration_ms:
             start_ms, end_ms = longest_segment
-            embedding = extract_embedding_from_segment(audio_path, start_ms, end_ms, speaker_label=speaker)
-            speaker_embeddings[speaker] = embedding
-            logger.info(f"  {speaker}: extracted from {longest_duration}ms segment [{start_ms}-{end_ms}ms]")
+            longest_segments[speaker] = longest_segment
+            logger.info(f"  {speaker}: using {longest_duration}ms segment [{start_ms}-{end_ms}ms]")
         else:
             logger.warning(f"  {speaker}: longest segment only {longest_duration}ms (< {min_duration_ms}ms), skipping")
     
-    return speaker_embeddings
+    if not longest_segments:
+        return {}
+    return extract_embeddings_for_segments(audio_path, longest_segments)
+
+
+def extract_embeddings_for_segments(
+    audio_path: Path,
+    segments: Dict[str, Tuple[int, int]]
+) -> Dict[str, np.ndarray]:
+    """
+    Embed several segments of one file with batched forward passes.
+    
+    The file is read once, every segment is cut into the same sliding windows
+    pyannote's Inference would use, and the windows of all segments go through
+    the model together. Each segment's window embeddings are then averaged and
+    normalized exactly as in extract_embedding_from_segment().
+    
+    Args:
+        audio_path: Path to audio file
+        segments: Label -> (start_ms, end_ms) of the segment to embed
+    
+    Returns:
+        Label -> normalized embedding
+    """
+    import soundfile as sf
+    
+    inference = get_inference_pipeline()
+    waveform, sample_rate = sf.read(str(audio_path), dtype="float32")
+    
+    # Convert to mono if needed
+    if waveform.ndim > 1:
+        waveform = waveform[:, 0]
+    
+    # Batching bypasses Inference.__call__ (and its resampling), so only do it when
+    # the audio is already at the model's rate and the pipeline slides windows.
+    # Otherwise embed each crop of the already-loaded waveform through __call__.
+    model_rate = getattr(getattr(inference.model, "audio", None), "sample_rate", None)
+    if getattr(inference, "window", None) != "sliding" or model_rate != sample_rate:
+        return {
+            label: _embed_crop(inference, waveform, sample_rate, start_ms, end_ms, label)
+            for label, (start_ms, end_ms) in segments.items()
+        }
+    
+    window_size = round(inference.duration * sample_rate)
+    step_size = round(inference.step * sample_rate)
+    
+    labels, counts, windows = [], [], []
+    for label, (start_ms, end_ms) in segments.items():
+        start_sample, end_sample = _sample_range(start_ms, end_ms, sample_rate)
+        chunks = _sliding_chunks(
+            torch.from_numpy(np.ascontiguousarray(waveform[start_sample:end_sample])),
+            window_size,
+            step_size,
+        )
+        labels.append(label)
+        counts.append(chunks.shape[0])
+        windows.append(chunks)
+    
+    batch = torch.cat(windows).unsqueeze(1)  # (windows, channel, samples)
+    batch_size = getattr(inference, "batch_size", 32)
+    with _inference_context(inference):
+        outputs = np.concatenate([
+            inference.infer(batch[i:i + batch_size]) for i in range(0, batch.shape[0], batch_size)
+        ]).astype(np.float32, copy=False)
+    logger.debug("Embedded {} segments as {} windows", len(labels), batch.shape[0])
+    
+    embeddings = {}
+    offsets = np.cumsum([0] + counts)
+    for label, lo, hi in zip(labels, offsets[:-1], offsets[1:]):
+        embedding_np = outputs[lo:hi].mean(axis=0)
+        embeddings[label] = _normalize(embedding_np)
+    return embeddings
+
+
+def _sliding_chunks(waveform: torch.Tensor, window_size: int, step_size: int) -> torch.Tensor:
+    """
+    Cut a mono waveform into (num_chunks, window_size) windows like Inference.slide().
+    
+    Complete windows start every step_size samples; a trailing partial window
+    (or the whole waveform, if shorter than one window) is zero-padded.
+    """
+    num_samples = waveform.shape[0]
+    if num_samples >= window_size:
+        chunks = waveform.unfold(0, window_size, step_size)
+    else:
+        chunks = waveform.new_zeros((0, window_size))
+    
+    num_chunks = chunks.shape[0]
+    if num_samples < window_size or (num_samples - window_size) % step_size > 0:
+        last_chunk = waveform[num_chunks * step_size:]
+        last_chunk = torch.nn.functional.pad(last_chunk, (0, window_size - last_chunk.shape[0]))
+        chunks = torch.cat([chunks, last_chunk.unsqueeze(0)])
+    return chunks
 
 
 def match_speaker_to_enrollment(
@@ -327,37 +555,31 @@ def match_speaker_to_enrollment(
     Returns:
         Speaker label that matches, or None if no match
     """
-    best_match = None
-    best_score = threshold
-    
-    logger.info("=" * 60)
-    logger.info("SPEAKER MATCHING DEBUG:")
-    logger.info(f"Enrollment embedding shape: {enrollment_embedding.shape}")
-    logger.info(f"Number of speakers in chunk: {len(speaker_embeddings)}")
-    logger.info(f"Threshold: {threshold}")
-    logger.info("-" * 60)
-    
-    similarities = {}
-    for speaker, embedding in speaker_embeddings.items():
-        similarity = cosine_similarity(enrollment_embedding, embedding)
-        similarities[speaker] = similarity
-        logger.info(f"  Speaker {speaker}:")
-        logger.info(f"    Embedding shape: {embedding.shape}")
-        logger.info(f"    Cosine similarity: {similarity:.4f}")
-        logger.info(f"    Above threshold? {similarity > threshold}")
-        
-        if similarity > best_score:
-            best_score = similarity
-            best_match = speaker
-    
-    logger.info("-" * 60)
+    if not speaker_embeddings:
+        return None
+    
+    # (K, D) matrix of chunk speakers; extraction already unit-normalizes each row,
+    # so one GEMV against the normalized enrollment gives every cosine similarity
+    labels = list(speaker_embeddings)
+    matrix = np.stack([speaker_embeddings[label] for label in labels]).astype(np.float32, copy=False)
+    enrollment = np.asarray(enrollment_embedding, dtype=np.float32)
+    enrollment_norm = math.sqrt(float(enrollment @ enrollment))
+    # An all-zero enrollment scores 0 against everyone, so nothing matches
+    scores = matrix @ (enrollment * (1.0 / enrollment_norm if enrollment_norm else 0.0))
+    
+    best = int(np.argmax(scores))  # first maximum, like the strict > scan it replaces
+    best_score = float(scores[best])
+    best_match = labels[best] if best_score > threshold else None
+    
+    logger.opt(lazy=True).info(
+        "Speaker matching ({} chunk speakers, threshold {}): {}",
+        lambda: len(labels),
+        lambda: threshold,
+        lambda: ", ".join(f"{label} {score:.4f}" for label, score in zip(labels, scores.tolist())),
+    )
     if best_match:
-        logger.info(f"✓ MATCHED: Speaker {best_match} with similarity {best_score:.4f}")
+        logger.info("✓ MATCHED: Speaker {} with similarity {:.4f}", best_match, best_score)
     else:
-        logger.warning(f"✗ NO MATCH: Best similarity was {max(similarities.values()):.4f}, threshold is {threshold}")
-        logger.warning(f"   Speakers: {list(similarities.keys())}")
-        logger.warning(f"   Scores: {[f'{s:.4f}' for s in similarities.values()]}")
-    logger.info("=" * 60)
+        logger.warning("✗ NO MATCH: Best similarity was {:.4f}, threshold is {}", best_score, threshold)
     
     return best_match
-
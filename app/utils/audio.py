@@ -3,10 +3,16 @@ Audio utility functions for processing WAV files.
 """
 
 from pathlib import Path
+import os
 import wave
-import struct
-from typing import Optional
-from app.config import settings
+from typing import BinaryIO, Callable, Optional, Tuple
+from app.config import get_settings
+from app.utils.audio_extraction import read_pcm_layout, read_wav_params, wav_header
+
+# Frames per readframes() call when copying audio (64 KiB of 16-bit stereo)
+COPY_CHUNK_FRAMES = 16384
+# Upper bound on the buffer written per call (silence padding, non-sendfile copies)
+COPY_BLOCK_BYTES = 64 * 1024
 
 
 class WAVInfo:
@@ -14,17 +20,34 @@ class WAVInfo:
     
     def __init__(self, path: Path):
         """
-        Read WAV file and extract metadata.
+        Read WAV file metadata from its header.
         
         Args:
             path: Path to WAV file
         """
-        with wave.open(str(path), 'rb') as w:
-            self.channels = w.getnchannels()
-            self.samplerate = w.getframerate()
-            self.frames = w.getnframes()
-            self.duration_s = self.frames / float(self.samplerate)
-            self.sampwidth = w.getsampwidth()
+        self._set(*read_wav_params(path))
+    
+    @classmethod
+    def from_params(cls, channels: int, sampwidth: int, samplerate: int, frames: int) -> "WAVInfo":
+        """
+        Build WAVInfo from already-known parameters, without reading a file.
+        
+        Args:
+            channels: Number of channels
+            sampwidth: Sample width in bytes
+            samplerate: Sample rate in Hz
+            frames: Number of frames
+        """
+        info = cls.__new__(cls)
+        info._set(channels, sampwidth, samplerate, frames)
+        return info
+    
+    def _set(self, channels: int, sampwidth: int, samplerate: int, frames: int) -> None:
+        self.channels = channels
+        self.samplerate = samplerate
+        self.frames = frames
+        self.duration_s = self.frames / float(self.samplerate)
+        self.sampwidth = sampwidth
 
     @property
     def duration_ms(self) -> int:
@@ -36,6 +59,9 @@ def generate_silence(duration_ms: int, sample_rate: int = 16000, channels: int =
     """
     Generate silence audio data.
     
+    Silence is the PCM zero level, so the frames are a single repeated byte:
+    0 for signed PCM, 128 for unsigned 8-bit WAV.
+    
     Args:
         duration_ms: Duration of silence in milliseconds
         sample_rate: Sample rate in Hz (default 16000)
@@ -46,9 +72,12 @@ def generate_silence(duration_ms: int, sample_rate: int = 16000, channels: int =
         Raw audio bytes of silence
     """
     num_samples = int((duration_ms / 1000.0) * sample_rate)
-    # Generate silence (zeros)
-    silence_data = struct.pack('h' * num_samples * channels, *([0] * (num_samples * channels)))
-    return silence_data
+    return _silence_byte(sampwidth) * (num_samples * channels * sampwidth)
+
+
+def _silence_byte(sampwidth: int) -> bytes:
+    """PCM zero level as one byte: 0x80 for unsigned 8-bit, 0x00 for signed widths."""
+    return b'\x80' if sampwidth == 1 else b'\x00'
 
 
 def concatenate_audio_files(
@@ -76,54 +105,159 @@ def concatenate_audio_files(
         ValueError: If audio files have incompatible parameters
     """
     if pad_ms is None:
-        pad_ms = settings.PAD_MS
+        pad_ms = get_settings().PAD_MS
     
-    # Read enrollment audio
-    with wave.open(str(enrollment_path), 'rb') as enroll_wav:
-        enroll_params = enroll_wav.getparams()
-        enroll_data = enroll_wav.readframes(enroll_wav.getnframes())
+    enroll_layout = read_pcm_layout(enrollment_path)
+    chunk_layout = read_pcm_layout(chunk_path)
+    if enroll_layout is not None and chunk_layout is not None:
+        # Plain PCM: the output is a new header plus the inputs' data chunks verbatim
+        _check_compatible(enroll_layout[:3], chunk_layout[:3])
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        frames = _concatenate_pcm(enrollment_path, enroll_layout, chunk_path, chunk_layout, output_path, pad_ms)
+        return WAVInfo.from_params(*enroll_layout[:3], frames)
     
-    # Read chunk audio
-    with wave.open(str(chunk_path), 'rb') as chunk_wav:
+    # Stream both inputs through the wave module, so memory stays O(chunk) whatever the file sizes
+    with wave.open(str(enrollment_path), 'rb') as enroll_wav, wave.open(str(chunk_path), 'rb') as chunk_wav:
+        enroll_params = enroll_wav.getparams()
         chunk_params = chunk_wav.getparams()
-        chunk_data = chunk_wav.readframes(chunk_wav.getnframes())
+        _check_compatible(
+            (enroll_params.nchannels, enroll_params.sampwidth, enroll_params.framerate),
+            (chunk_params.nchannels, chunk_params.sampwidth, chunk_params.framerate),
+        )
+        
+        # Create output directory if needed
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Write concatenated audio; the header's frame count is patched once on close
+        with wave.open(str(output_path), 'wb') as out_wav:
+            out_wav.setparams(enroll_params)
+            data_size = _copy_frames(enroll_wav, out_wav)
+            data_size += _write_silence(
+                out_wav.writeframesraw,
+                pad_ms,
+                framerate=enroll_params.framerate,
+                channels=enroll_params.nchannels,
+                sampwidth=enroll_params.sampwidth,
+            )
+            data_size += _copy_frames(chunk_wav, out_wav)
+    
+    # Everything written is known, so there's no need to reopen the output
+    frame_size = enroll_params.nchannels * enroll_params.sampwidth
+    return WAVInfo.from_params(
+        enroll_params.nchannels, enroll_params.sampwidth, enroll_params.framerate, data_size // frame_size
+    )
+
+
+def _check_compatible(enroll_format: Tuple[int, int, int], chunk_format: Tuple[int, int, int]) -> None:
+    """
+    Verify enrollment and chunk audio can be concatenated.
     
-    # Verify compatibility
-    if enroll_params.nchannels != chunk_params.nchannels:
+    Args:
+        enroll_format: (n_channels, sample_width, framerate) of the enrollment
+        chunk_format: (n_channels, sample_width, framerate) of the chunk
+    
+    Raises:
+        ValueError: If the formats differ
+    """
+    enroll_channels, enroll_sampwidth, enroll_framerate = enroll_format
+    chunk_channels, chunk_sampwidth, chunk_framerate = chunk_format
+    
+    if enroll_channels != chunk_channels:
         raise ValueError(
-            f"Channel mismatch: enrollment has {enroll_params.nchannels} channels, "
-            f"chunk has {chunk_params.nchannels} channels"
+            f"Channel mismatch: enrollment has {enroll_channels} channels, "
+            f"chunk has {chunk_channels} channels"
         )
     
-    if enroll_params.framerate != chunk_params.framerate:
+    if enroll_framerate != chunk_framerate:
         raise ValueError(
-            f"Sample rate mismatch: enrollment is {enroll_params.framerate}Hz, "
-            f"chunk is {chunk_params.framerate}Hz"
+            f"Sample rate mismatch: enrollment is {enroll_framerate}Hz, "
+            f"chunk is {chunk_framerate}Hz"
         )
     
-    if enroll_params.sampwidth != chunk_params.sampwidth:
+    if enroll_sampwidth != chunk_sampwidth:
         raise ValueError(
-            f"Sample width mismatch: enrollment is {enroll_params.sampwidth} bytes, "
-            f"chunk is {chunk_params.sampwidth} bytes"
+            f"Sample width mismatch: enrollment is {enroll_sampwidth} bytes, "
+            f"chunk is {chunk_sampwidth} bytes"
         )
+
+
+def _concatenate_pcm(
+    enrollment_path: Path,
+    enroll_layout: Tuple[int, int, int, int, int],
+    chunk_path: Path,
+    chunk_layout: Tuple[int, int, int, int, int],
+    output_path: Path,
+    pad_ms: int
+) -> int:
+    """
+    Write header + enrollment frames + silence + chunk frames for two PCM WAVs.
     
-    # Generate silence padding
-    silence_data = generate_silence(
-        duration_ms=pad_ms,
-        sample_rate=enroll_params.framerate,
-        channels=enroll_params.nchannels,
-        sampwidth=enroll_params.sampwidth
-    )
+    The data chunks are copied with os.sendfile() where available, so the
+    audio never passes through Python buffers.
+    
+    Returns:
+        Number of frames written
+    """
+    n_channels, sample_width, framerate, _, _ = enroll_layout
+    pad_bytes = int((pad_ms / 1000.0) * framerate) * n_channels * sample_width
+    data_size = enroll_layout[4] + pad_bytes + chunk_layout[4]
     
-    # Create output directory if needed
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'wb') as out:
+        out.write(wav_header(n_channels, sample_width, framerate, data_size))
+        with open(enrollment_path, 'rb') as src:
+            _copy_range(src, out, enroll_layout[3], enroll_layout[4])
+        _write_silence(out.write, pad_ms, framerate=framerate, channels=n_channels, sampwidth=sample_width)
+        with open(chunk_path, 'rb') as src:
+            _copy_range(src, out, chunk_layout[3], chunk_layout[4])
     
-    # Write concatenated audio
-    with wave.open(str(output_path), 'wb') as out_wav:
-        out_wav.setparams(enroll_params)
-        out_wav.writeframes(enroll_data)
-        out_wav.writeframes(silence_data)
-        out_wav.writeframes(chunk_data)
+    return data_size // (n_channels * sample_width)
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, count: int) -> None:
+    """Append count bytes of src, starting at offset, to dst (kernel-side with sendfile when possible)."""
+    dst.flush()  # sendfile writes at the descriptor's position, behind the buffered writer
+    if hasattr(os, "sendfile"):
+        try:
+            while count > 0:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+        except OSError:
+            pass  # e.g. a filesystem without sendfile support
+        if count == 0:
+            return
+        # sendfile failed or stopped early; copy what's left from the updated offset
     
-    return WAVInfo(output_path)
+    src.seek(offset)
+    while count > 0:
+        data = src.read(min(count, COPY_BLOCK_BYTES))
+        if not data:
+            break
+        dst.write(data)
+        count -= len(data)
+
+
+def _copy_frames(src_wav: wave.Wave_read, dst_wav: wave.Wave_write, chunk_frames: int = COPY_CHUNK_FRAMES) -> int:
+    """Copy the remaining frames of src_wav to dst_wav, chunk_frames at a time; returns bytes copied."""
+    copied = 0
+    while True:
+        data = src_wav.readframes(chunk_frames)
+        if not data:
+            return copied
+        dst_wav.writeframesraw(data)
+        copied += len(data)
+
 
+def _write_silence(write: Callable[[bytes], object], pad_ms: int, framerate: int, channels: int, sampwidth: int) -> int:
+    """Write the same frames as generate_silence(), in blocks of at most COPY_BLOCK_BYTES; returns bytes written."""
+    frame_bytes = channels * sampwidth
+    total = remaining = int((pad_ms / 1000.0) * framerate) * frame_bytes
+    block_bytes = min(remaining, max(1, COPY_BLOCK_BYTES // frame_bytes) * frame_bytes)
+    block = memoryview(_silence_byte(sampwidth) * block_bytes)
+    while remaining > 0:
+        n = min(remaining, len(block))
+        write(block[:n])
+        remaining -= n
+    return total
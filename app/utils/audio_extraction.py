@@ -2,12 +2,30 @@
 Audio extraction utilities for extracting segments from larger audio files.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import BinaryIO
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+import mmap
+import os
 import wave
 import struct
-from io import BytesIO
+import numpy as np
 from loguru import logger
+from app.utils.jit import NUMBA_AVAILABLE, njit
+
+# Bytes per chunk when streaming a segment to the client
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Batches smaller than this are amplified sequentially; pool startup would dominate
+PARALLEL_MIN_SEGMENTS = 8
+
+# WAVE_FORMAT_PCM in the fmt chunk; only uncompressed PCM can be sliced by byte offset
+WAVE_FORMAT_PCM = 1
+
+# Precompiled RIFF layouts: chunk header, PCM fmt body, canonical 44-byte file header
+_CHUNK_HEADER = struct.Struct('<4sI')
+_FMT_BODY = struct.Struct('<HHIIHH')
+_WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
 
 
 def extract_audio_segment(
@@ -20,6 +38,10 @@ def extract_audio_segment(
     """
     Extract a segment from an audio file and return as bytes.
     
+    PCM files are memory-mapped and sliced by byte offset, and the output is
+    a prebuilt 44-byte header plus the (amplified) frames in one piece. The
+    range is clamped to the file; non-PCM input goes through the wave module.
+    
     Args:
         input_path: Path to input WAV file
         start_ms: Start time in milliseconds
@@ -30,48 +52,302 @@ def extract_audio_segment(
     Returns:
         Audio segment as bytes
     """
-    logger.info(f"Extracting segment [{start_ms}ms - {end_ms}ms] from {input_path} (amplify={amplify}x)")
+    logger.debug("Extracting segment [{}ms - {}ms] from {} (amplify={}x)", start_ms, end_ms, input_path, amplify)
+    
+    with open(input_path, 'rb') as f:
+        layout = _read_pcm_layout(f)
+        if layout is not None:
+            # Only the segment's pages are read
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start, end = _pcm_byte_range(layout, len(mm), start_ms, end_ms)
+                audio_data = mm[start:end]
+    
+    if layout is None:
+        output_bytes = _extract_with_wave(input_path, start_ms, end_ms, amplify)
+    else:
+        n_channels, sample_width, framerate, _, _ = layout
+        if amplify != 1.0:
+            audio_data = _amplify_audio(audio_data, sample_width, amplify)
+        output_bytes = wav_header(n_channels, sample_width, framerate, len(audio_data)) + audio_data
+    
+    logger.info("Extracted segment: {} bytes, duration={}ms", len(output_bytes), end_ms - start_ms)
+    
+    return output_bytes
+
+
+def stream_audio_segment(
+    input_path: Path,
+    start_ms: int,
+    end_ms: int,
+    amplify: float = 6.0,
+    chunk_bytes: int = STREAM_CHUNK_BYTES
+) -> Tuple[int, Iterator[bytes]]:
+    """
+    Stream a segment of an audio file as a WAV without buffering it all in memory.
+    
+    The WAV header is parsed eagerly so errors surface before a response is
+    started; the returned iterator then yields the new header followed by the
+    (amplified) PCM frames in chunks of roughly chunk_bytes. PCM files are
+    memory-mapped and sliced by byte offset; anything else falls back to the
+    wave module.
+    
+    Args:
+        input_path: Path to input WAV file
+        start_ms: Start time in milliseconds
+        end_ms: End time in milliseconds
+        amplify: Amplification factor (default 6.0 = 6x louder)
+        chunk_bytes: Approximate size of each yielded chunk
+    
+    Returns:
+        Tuple of (total WAV size in bytes, iterator of byte chunks)
+    """
+    with open(input_path, 'rb') as f:
+        layout = _read_pcm_layout(f)
+        if layout is None:
+            # Not plain PCM (or an unusual header): let the wave module decode it
+            return _stream_with_wave(input_path, start_ms, end_ms, amplify, chunk_bytes)
+        # The mapping stays valid after the file object is closed
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    n_channels, sample_width, framerate, _, _ = layout
+    frame_size = n_channels * sample_width
+    start, end = _pcm_byte_range(layout, len(mm), start_ms, end_ms)
+    
+    header = wav_header(n_channels, sample_width, framerate, end - start)
+    step = max(1, chunk_bytes // frame_size) * frame_size
+    
+    amplify_blocks = _should_amplify(sample_width, amplify)
+    
+    def _iter() -> Iterator[bytes]:
+        try:
+            yield header
+            for pos in range(start, end, step):
+                audio_data = mm[pos:min(pos + step, end)]
+                if amplify_blocks:
+                    audio_data = _amplify_audio(audio_data, sample_width, amplify)
+                yield audio_data
+        finally:
+            mm.close()
+    
+    return len(header) + (end - start), _iter()
+
+
+def extract_audio_segments_batch(
+    input_path: Path,
+    ranges: List[Tuple[int, int]],
+    amplify: float = 6.0,
+    max_workers: Optional[int] = None
+) -> List[bytes]:
+    """
+    Extract several segments of one audio file as WAV bytes.
     
-    # Open input file
-    with wave.open(str(input_path), 'rb') as wav_in:
-        # Get audio parameters
+    The file is opened, its header parsed and its PCM data memory-mapped once
+    for all ranges; segments are then sliced in start order so pages are read
+    front to back, and one summary line is logged for the whole batch. With
+    amplification and at least PARALLEL_MIN_SEGMENTS ranges, segments are
+    amplified on a thread pool sharing the one mapping (the NumPy/Numba
+    amplifier releases the GIL, and threads avoid copying every segment
+    between processes). Non-PCM files are decoded range by range with the
+    wave module.
+    
+    Args:
+        input_path: Path to input WAV file
+        ranges: (start_ms, end_ms) of each segment
+        amplify: Amplification factor (default 6.0 = 6x louder)
+        max_workers: Thread pool size (None = ThreadPoolExecutor default, 1 = sequential)
+    
+    Returns:
+        One WAV per range, in the order of ranges
+    """
+    with open(input_path, 'rb') as f:
+        layout = _read_pcm_layout(f)
+        if layout is None:
+            return [_extract_with_wave(input_path, s, e, amplify) for s, e in ranges]
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    n_channels, sample_width, framerate, _, _ = layout
+    amplify_segments = _should_amplify(sample_width, amplify)
+    
+    def _segment(i: int) -> bytes:
+        start, end = _pcm_byte_range(layout, len(mm), *ranges[i])
+        audio_data = mm[start:end]
+        if amplify_segments:
+            audio_data = _amplify_audio(audio_data, sample_width, amplify)
+        return wav_header(n_channels, sample_width, framerate, end - start) + audio_data
+    
+    order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+    segments: List[bytes] = [b""] * len(ranges)
+    with mm:
+        if not amplify_segments or len(ranges) < PARALLEL_MIN_SEGMENTS or max_workers == 1:
+            for i in order:
+                segments[i] = _segment(i)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for i, segment in zip(order, pool.map(_segment, order)):
+                    segments[i] = segment
+    
+    logger.info(
+        "Extracted {} segments, {} bytes from {} (amplify={}x)",
+        len(ranges), sum(map(len, segments)), input_path, amplify,
+    )
+    return segments
+
+
+def _pcm_byte_range(
+    layout: Tuple[int, int, int, int, int],
+    file_size: int,
+    start_ms: int,
+    end_ms: int
+) -> Tuple[int, int]:
+    """
+    Byte range of a segment's frames within a PCM WAV, clamped to the file.
+    
+    Args:
+        layout: Result of _read_pcm_layout()
+        file_size: Actual size of the file in bytes
+        start_ms: Start time in milliseconds
+        end_ms: End time in milliseconds
+    
+    Returns:
+        (start, end) byte offsets; end >= start
+    """
+    n_channels, sample_width, framerate, data_offset, data_size = layout
+    frame_size = n_channels * sample_width
+    # Recorders that never finalized the header can report a bogus data size
+    total_frames = max(0, min(data_size, file_size - data_offset)) // frame_size
+    
+    start_frame = min(int(start_ms * framerate / 1000), total_frames)
+    end_frame = min(int(end_ms * framerate / 1000), total_frames)
+    start = data_offset + start_frame * frame_size
+    end = data_offset + max(start_frame, end_frame) * frame_size
+    return start, end
+
+
+def _extract_with_wave(input_path: Path, start_ms: int, end_ms: int, amplify: float) -> bytes:
+    """Whole-segment WAV bytes for non-PCM input, via the wave module."""
+    _, chunks = _stream_with_wave(input_path, start_ms, end_ms, amplify, STREAM_CHUNK_BYTES)
+    return b"".join(chunks)
+
+
+def _stream_with_wave(
+    input_path: Path,
+    start_ms: int,
+    end_ms: int,
+    amplify: float,
+    chunk_bytes: int
+) -> Tuple[int, Iterator[bytes]]:
+    """Fallback for stream_audio_segment that decodes frames with the wave module."""
+    wav_in = wave.open(str(input_path), 'rb')
+    try:
         n_channels = wav_in.getnchannels()
         sample_width = wav_in.getsampwidth()
         framerate = wav_in.getframerate()
         
-        # Calculate frame positions
-        start_frame = int(start_ms * framerate / 1000)
-        end_frame = int(end_ms * framerate / 1000)
-        n_frames = end_frame - start_frame
-        
-        # Seek to start position and read frames
+        # Calculate frame positions, clamped to the file
+        start_frame = min(int(start_ms * framerate / 1000), wav_in.getnframes())
+        end_frame = min(int(end_ms * framerate / 1000), wav_in.getnframes())
+        n_frames = max(0, end_frame - start_frame)
         wav_in.setpos(start_frame)
-        audio_data = wav_in.readframes(n_frames)
+    except Exception:
+        wav_in.close()
+        raise
     
-    # Amplify audio if requested
-    if amplify != 1.0:
-        audio_data = _amplify_audio(audio_data, sample_width, amplify)
+    frame_size = n_channels * sample_width
+    data_size = n_frames * frame_size
+    header = wav_header(n_channels, sample_width, framerate, data_size)
+    frames_per_chunk = max(1, chunk_bytes // frame_size)
+    amplify_blocks = _should_amplify(sample_width, amplify)
     
-    # Create output WAV in memory
-    output_buffer = BytesIO()
-    with wave.open(output_buffer, 'wb') as wav_out:
-        wav_out.setnchannels(n_channels)
-        wav_out.setsampwidth(sample_width)
-        wav_out.setframerate(framerate)
-        wav_out.writeframes(audio_data)
+    def _iter() -> Iterator[bytes]:
+        try:
+            yield header
+            remaining = n_frames
+            while remaining > 0:
+                audio_data = wav_in.readframes(min(frames_per_chunk, remaining))
+                if not audio_data:
+                    break
+                remaining -= len(audio_data) // frame_size
+                if amplify_blocks:
+                    audio_data = _amplify_audio(audio_data, sample_width, amplify)
+                yield audio_data
+        finally:
+            wav_in.close()
     
-    # Get bytes
-    output_bytes = output_buffer.getvalue()
+    return len(header) + data_size, _iter()
+
+
+def _read_pcm_layout(f: BinaryIO) -> Optional[Tuple[int, int, int, int, int]]:
+    """
+    Walk the RIFF chunks of a WAV file to locate its PCM data.
     
-    logger.info(f"Extracted segment: {len(output_bytes)} bytes, duration={(end_ms-start_ms)}ms")
+    Args:
+        f: WAV file opened in binary mode, positioned at the start
     
-    return output_bytes
+    Returns:
+        Tuple of (n_channels, sample_width, framerate, data_offset, data_size),
+        or None if the file is not an uncompressed PCM WAV
+    """
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        return None
+    
+    fmt = None
+    while True:
+        chunk_header = f.read(_CHUNK_HEADER.size)
+        if len(chunk_header) < _CHUNK_HEADER.size:
+            return None
+        chunk_id, chunk_size = _CHUNK_HEADER.unpack(chunk_header)
+        
+        if chunk_id == b'data':
+            if fmt is None:
+                return None
+            format_tag, n_channels, framerate, _, _, bits_per_sample = fmt
+            if format_tag != WAVE_FORMAT_PCM or n_channels == 0 or bits_per_sample < 8:
+                return None
+            return n_channels, bits_per_sample // 8, framerate, f.tell(), chunk_size
+        
+        if chunk_id == b'fmt ' and chunk_size >= _FMT_BODY.size:
+            fmt = _FMT_BODY.unpack(f.read(_FMT_BODY.size))
+            f.seek(chunk_size - _FMT_BODY.size, 1)
+        else:
+            f.seek(chunk_size, 1)
+        
+        # Chunks are word-aligned
+        if chunk_size % 2:
+            f.seek(1, 1)
+
+
+def wav_header(n_channels: int, sample_width: int, framerate: int, data_size: int) -> bytes:
+    """
+    Build a canonical 44-byte PCM WAV header.
+    
+    Args:
+        n_channels: Number of channels
+        sample_width: Bytes per sample
+        framerate: Sample rate in Hz
+        data_size: Size of the PCM data chunk in bytes
+    
+    Returns:
+        Header bytes
+    """
+    block_align = n_channels * sample_width
+    return _WAV_HEADER.pack(
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, n_channels, framerate, framerate * block_align, block_align, sample_width * 8,
+        b'data', data_size
+    )
 
 
 def _amplify_audio(audio_data: bytes, sample_width: int, factor: float) -> bytes:
     """
     Amplify audio data by multiplying samples.
     
+    Samples are scaled, clamped to the int16 range to prevent wrap-around,
+    and truncated toward zero, as array operations. 16-bit audio is scaled in
+    16.16 fixed point (integer multiply and shift, in a fused Numba kernel
+    when Numba is installed), so factor is applied with 1/65536 precision,
+    far below anything audible.
+    
     Args:
         audio_data: Raw audio bytes
         sample_width: Bytes per sample (1=8bit, 2=16bit)
@@ -80,26 +356,139 @@ def _amplify_audio(audio_data: bytes, sample_width: int, factor: float) -> bytes
     Returns:
         Amplified audio data
     """
-    if sample_width == 2:  # 16-bit audio (most common)
-        # Unpack as signed 16-bit integers
-        samples = struct.unpack(f'<{len(audio_data)//2}h', audio_data)
-        
-        # Amplify and clamp to prevent clipping
-        amplified = []
-        for sample in samples:
-            new_sample = int(sample * factor)
-            # Clamp to 16-bit range
-            new_sample = max(-32768, min(32767, new_sample))
-            amplified.append(new_sample)
-        
-        # Pack back to bytes
-        return struct.pack(f'<{len(amplified)}h', *amplified)
+    if sample_width == 2:  # 16-bit audio (most common), signed little-endian
+        return amplify_samples(to_int16(audio_data), factor).tobytes()
     else:
         # For other sample widths, just return unchanged
-        logger.warning(f"Amplification not supported for sample_width={sample_width}")
+        logger.warning("Amplification not supported for sample_width={}", sample_width)
         return audio_data
 
 
+def _should_amplify(sample_width: int, factor: float) -> bool:
+    """
+    Whether blocks of this audio should go through _amplify_audio().
+    
+    Streaming callers check once up front, so an unsupported sample width is
+    warned about once per request rather than once per block.
+    """
+    if factor == 1.0:
+        return False
+    if sample_width != 2:
+        logger.warning("Amplification not supported for sample_width={}", sample_width)
+        return False
+    return True
+
+
+def to_int16(audio_data: bytes) -> np.ndarray:
+    """Zero-copy int16 view of 16-bit little-endian PCM bytes (read-only for bytes input)."""
+    return np.frombuffer(audio_data, dtype='<i2')
+
+
+def amplify_samples(samples: np.ndarray, factor: float) -> np.ndarray:
+    """
+    Amplify int16 samples, clamping to the int16 range.
+    
+    Array in, array out, so sample processing can be chained without
+    round-tripping through bytes; call .tobytes() once at the end.
+    
+    Args:
+        samples: int16 samples (e.g. from to_int16())
+        factor: Amplification factor
+    
+    Returns:
+        New '<i2' array of amplified samples
+    """
+    return _amplify_i16(samples, _fixed_gain(factor)).astype('<i2', copy=False)
+
+
+# 16.16 fixed-point gain: sample * gain >> 16 == sample * factor
+FIXED_SHIFT = 16
+_FIXED_ONE = 1 << FIXED_SHIFT
+# Any gain past 2**16 saturates every non-zero sample; capping it keeps products within int64
+_MAX_FIXED_GAIN = 1 << 32
+_I16_MIN_FIXED = -32768 << FIXED_SHIFT
+_I16_MAX_FIXED = 32767 << FIXED_SHIFT
+
+
+def _fixed_gain(factor: float) -> int:
+    """Convert an amplification factor to a 16.16 fixed-point integer."""
+    return max(-_MAX_FIXED_GAIN, min(_MAX_FIXED_GAIN, round(factor * _FIXED_ONE)))
+
+
+def _amplify_i16_kernel(samples: np.ndarray, gain: int) -> np.ndarray:
+    """
+    Scale, clamp and truncate int16 samples in one fused integer pass.
+    
+    Products are clamped in fixed point, then negatives are biased by
+    _FIXED_ONE - 1 so the arithmetic shift truncates toward zero like int().
+    """
+    out = np.empty(samples.shape[0], dtype=np.int16)
+    for i in range(samples.shape[0]):
+        p = min(max(np.int64(samples[i]) * gain, _I16_MIN_FIXED), _I16_MAX_FIXED)
+        out[i] = (p + ((p >> 63) & (_FIXED_ONE - 1))) >> FIXED_SHIFT
+    return out
+
+
+def _amplify_i16_np(samples: np.ndarray, gain: int) -> np.ndarray:
+    """NumPy fallback for _amplify_i16_kernel."""
+    p = np.clip(samples.astype(np.int64) * gain, _I16_MIN_FIXED, _I16_MAX_FIXED)
+    return ((p + ((p >> 63) & (_FIXED_ONE - 1))) >> FIXED_SHIFT).astype(np.int16)
+
+
+# Compiled with Numba when installed; otherwise the vectorized NumPy fallback
+if NUMBA_AVAILABLE:
+    _amplify_i16 = njit(_amplify_i16_kernel)
+else:
+    _amplify_i16 = _amplify_i16_np
+
+
+def read_pcm_layout(audio_path: Path) -> Optional[Tuple[int, int, int, int, int]]:
+    """
+    Locate the PCM frames of a WAV file from its header.
+    
+    Args:
+        audio_path: Path to WAV file
+    
+    Returns:
+        Tuple of (n_channels, sample_width, framerate, data_offset, data_size)
+        with data_size clamped to the whole frames present in the file, or
+        None if the file is not an uncompressed PCM WAV
+    """
+    with open(audio_path, 'rb') as f:
+        layout = _read_pcm_layout(f)
+        file_size = os.fstat(f.fileno()).st_size
+    if layout is None:
+        return None
+    
+    n_channels, sample_width, framerate, data_offset, data_size = layout
+    frame_size = n_channels * sample_width
+    data_size = max(0, min(data_size, file_size - data_offset)) // frame_size * frame_size
+    return n_channels, sample_width, framerate, data_offset, data_size
+
+
+def read_wav_params(audio_path: Path) -> Tuple[int, int, int, int]:
+    """
+    Read a WAV file's format and length from its header.
+    
+    PCM files only have their RIFF chunk headers read (a page or so, however
+    long the audio); anything else falls back to the wave module.
+    
+    Args:
+        audio_path: Path to WAV file
+    
+    Returns:
+        Tuple of (n_channels, sample_width, framerate, n_frames)
+    """
+    with open(audio_path, 'rb') as f:
+        layout = _read_pcm_layout(f)
+    if layout is not None:
+        n_channels, sample_width, framerate, _, data_size = layout
+        return n_channels, sample_width, framerate, data_size // (n_channels * sample_width)
+    
+    with wave.open(str(audio_path), 'rb') as wav:
+        return wav.getnchannels(), wav.getsampwidth(), wav.getframerate(), wav.getnframes()
+
+
 def get_audio_duration_ms(audio_path: Path) -> int:
     """
     Get duration of audio file in milliseconds.
@@ -110,10 +499,7 @@ def get_audio_duration_ms(audio_path: Path) -> int:
     Returns:
         Duration in milliseconds
     """
-    with wave.open(str(audio_path), 'rb') as wav:
-        frames = wav.getnframes()
-        rate = wav.getframerate()
-        duration_ms = int((frames / rate) * 1000)
+    _, _, rate, frames = read_wav_params(audio_path)
+    duration_ms = int((frames / rate) * 1000)
     
     return duration_ms
-
@@ -0,0 +1,35 @@
+"""
+Optional Numba JIT support.
+
+Numba is an optional dependency (``pip install numba``). Hot loops are
+written as small kernels over NumPy arrays and compiled with ``njit`` when
+NUMBA_AVAILABLE is true; callers keep a NumPy/Python fallback otherwise.
+"""
+
+from typing import Any, Callable
+
+try:
+    from numba import njit as _numba_njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba not installed
+    _numba_njit = None
+    NUMBA_AVAILABLE = False
+
+
+def njit(kernel: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Compile kernel in nopython mode with an on-disk cache, if Numba is installed.
+
+    cache=True keeps compiled machine code in __pycache__, so only the first
+    process after a code change pays the compile time. nogil=True lets other
+    threads run while a kernel executes (kernels never touch Python objects).
+
+    Args:
+        kernel: Function using only NumPy arrays/scalars
+
+    Returns:
+        The compiled kernel, or kernel unchanged when Numba is unavailable
+    """
+    if _numba_njit is None:
+        return kernel
+    return _numba_njit(cache=True, nogil=True)(kernel)
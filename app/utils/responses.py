@@ -0,0 +1,23 @@
+"""
+Fast JSON responses backed by orjson.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson.
+
+    orjson serializes datetimes, numpy arrays and non-str dict keys natively,
+    several times faster than the stdlib encoder. Defined here rather than
+    imported from fastapi.responses, whose copy is deprecated in newer FastAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
@@ -5,7 +5,16 @@ echo "🚀 Starting Selective Speaker Backend..."
 
 # Create database tables
 echo "📊 Creating database tables..."
-python -c "from app.db import Base, engine; import app.models; Base.metadata.create_all(engine)"
+python -c "
+import asyncio
+from app.db import engine, init_db
+
+async def main():
+    await init_db()
+    await engine.dispose()
+
+asyncio.run(main())
+"
 
 echo "✅ Database tables created successfully!"
 
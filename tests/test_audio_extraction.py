@@ -0,0 +1,57 @@
+"""
+Tests for WAV segment extraction.
+"""
+
+import struct
+import wave
+
+from app.utils.audio_extraction import stream_audio_segment, _amplify_audio, _stream_with_wave
+
+
+def _write_wav(path, n_frames=16000, framerate=16000):
+    samples = [(i * 37) % 2000 - 1000 for i in range(n_frames)]
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(framerate)
+        wav.writeframes(struct.pack(f'<{n_frames}h', *samples))
+
+
+def test_stream_segment_matches_wave_decoding(tmp_path):
+    """The mmap fast path yields exactly what the wave module fallback yields."""
+    path = tmp_path / "chunk.wav"
+    _write_wav(path)
+
+    for amplify in (1.0, 6.0):
+        size, chunks = stream_audio_segment(path, 250, 750, amplify=amplify, chunk_bytes=1000)
+        expected_size, expected = _stream_with_wave(path, 250, 750, amplify, 1000)
+        data = b"".join(chunks)
+
+        assert size == expected_size == len(data)
+        assert data == b"".join(expected)
+
+
+def test_stream_segment_is_a_valid_wav_clamped_to_the_file(tmp_path):
+    """Ranges past the end of the file are clamped and the header is consistent."""
+    path = tmp_path / "chunk.wav"
+    _write_wav(path)
+    out = tmp_path / "segment.wav"
+
+    size, chunks = stream_audio_segment(path, 900, 5000, amplify=1.0)
+    out.write_bytes(b"".join(chunks))
+
+    assert out.stat().st_size == size
+    with wave.open(str(out), 'rb') as wav:
+        assert wav.getframerate() == 16000
+        assert wav.getnframes() == 1600  # 900ms..1000ms
+
+
+def test_amplify_scales_truncates_and_clamps():
+    """16-bit samples saturate at the int16 range; other sample widths pass through unchanged."""
+    samples = struct.pack('<5h', 0, 1000, -1000, 20000, -20000)
+    amplified = struct.unpack('<5h', _amplify_audio(samples, 2, 1.5))
+    assert amplified == (0, 1500, -1500, 30000, -30000)
+    assert struct.unpack('<2h', _amplify_audio(struct.pack('<2h', 30000, -30000), 2, 6.0)) == (32767, -32768)
+    assert struct.unpack('<h', _amplify_audio(struct.pack('<h', -3), 2, 0.5)) == (-1,)  # toward zero
+
+    assert _amplify_audio(bytes([0, 100, 128, 130, 255]), 1, 6.0) == bytes([0, 100, 128, 130, 255])
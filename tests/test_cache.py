@@ -0,0 +1,46 @@
+"""
+Tests for the in-process TTL cache.
+"""
+
+import time
+
+from app.utils.cache import TTLCache
+
+
+def test_cache_returns_stored_values():
+    """Stored values come back until popped."""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.get("missing", "default") == "default"
+
+    assert cache.pop("a") == 1
+    assert cache.get("a") is None
+
+
+def test_cache_expires_entries():
+    """Entries disappear once their TTL has passed."""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("short", "value", ttl=0.01)
+    cache.set("long", "value")
+
+    time.sleep(0.02)
+
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+
+
+def test_cache_evicts_least_recently_used():
+    """The least recently used entry is evicted past maxsize."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" becomes least recently used
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
@@ -2,6 +2,7 @@
 Tests for the diarization mapper service.
 """
 
+from app.services.assemblyai_client import words_to_arrays
 from app.services.diarization_mapper import map_enrollment_anchored
 
 
@@ -113,3 +114,45 @@ def test_mapper_filters_short_segments():
     # The "ok" should be filtered out
     assert "ok" not in kept[0]["text"]
 
+
+def test_mapper_maps_non_str_labels():
+    """Int and None speaker labels map the same from word dicts and WordArrays."""
+    for user, other in ((0, None), (None, 0)):
+        words = [
+            # Enrollment (0..3000ms): user dominates
+            {"start": 0, "end": 2600, "speaker": user, "confidence": 0.9, "text": "my enrollment"},
+            {"start": 2600, "end": 2900, "speaker": other, "confidence": 0.9, "text": "hm"},
+            # Chunk (>=3000ms)
+            {"start": 3100, "end": 3700, "speaker": user, "confidence": 0.8, "text": "hello"},
+            {"start": 3800, "end": 4400, "speaker": user, "confidence": 0.8, "text": "there"},
+            {"start": 4500, "end": 5600, "speaker": other, "confidence": 0.7, "text": "other person"},
+            {"start": 6500, "end": 7800, "speaker": user, "confidence": 0.9, "text": "second part"},
+            {"start": 8000, "end": 8300, "speaker": 1, "confidence": 0.6, "text": "no"},
+        ]
+        expected = [
+            {"start_ms": 100, "end_ms": 1400, "text": "hello there", "avg_conf": 0.8},
+            {"start_ms": 3500, "end_ms": 4800, "text": "second part", "avg_conf": 0.9},
+        ]
+        
+        for stt_words in (words, words_to_arrays(words)):
+            res = map_enrollment_anchored(stt_words, enroll_ms=3000)
+            
+            assert res["status"] == "ok"
+            assert res["user_label"] is user
+            assert res["kept"] == expected
+
+
+def test_words_to_arrays_keeps_speaker_labels():
+    """Non-str speaker labels come back unchanged, not coerced to str."""
+    words = [
+        {"start": 0, "end": 500, "speaker": 0, "confidence": 0.9, "text": "zero"},
+        {"start": 500, "end": 900, "speaker": None, "text": "unknown"},
+        {"start": 900, "end": 1500, "speaker": "0", "confidence": 0.8, "text": "string"},
+    ]
+    
+    arrays = words_to_arrays(words)
+    
+    assert arrays.speakers.tolist() == [0, None, "0"]
+    assert [type(s) for s in arrays.speakers.tolist()] == [int, type(None), str]
+    assert arrays.select(arrays.speakers == 0).texts.tolist() == ["zero"]
+    assert arrays.confidences.tolist() == [0.9, 1.0, 0.8]